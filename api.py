@@ -0,0 +1,107 @@
+"""Headless HTTP API serving the question results without Streamlit.
+
+An async Starlette app over the same data layer as the dashboard. Requests
+run on a thread pool and share the process-wide caches: concurrent requests
+for the same question wait for a single computation (TTLCache.get_or_load),
+and encoded responses are cached per format until a refresh touches their
+table.
+
+    GET  /scenarios                      scenarios and their question ids
+    GET  /questions                      every question with its chart spec
+    GET  /questions/{id}?format=json     result rows (also arrow, figure, html;
+                                         `Accept: application/vnd.apache.arrow.stream`
+                                         selects arrow)
+    POST /refresh                        pull newly landed quarters (and list
+                                         tables the database could not check)
+    GET  /health                         cache statistics
+    GET  /metrics                        Prometheus metrics (metrics.py)
+
+    uvicorn api:app --port 8000          # or: python api.py [port]
+"""
+import contextlib
+import sys
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+import data
+import metrics
+from export import FORMATS, encode
+from questions import QUESTIONS, SCENARIOS
+
+
+def _describe(question):
+    return {"id": question.id, "label": question.label, "table": question.query.table,
+            "chart": {"kind": question.chart.kind, "title": question.chart.title,
+                      **{k: list(v) if isinstance(v, tuple) else v for k, v in question.chart.options}}}
+
+
+def _format(request):
+    fmt = request.query_params.get("format")
+    if fmt is None:
+        fmt = "arrow" if FORMATS["arrow"].media_type in request.headers.get("accept", "") else "json"
+    return fmt
+
+
+def _load(question_id, fmt):
+    with metrics.request(source="api", question=question_id, format=fmt):
+        data.refresh_if_due()
+        return encode(question_id, fmt)
+
+
+async def scenarios(request):
+    return JSONResponse([{"id": s.id, "title": s.title, "description": s.description,
+                          "questions": [q.id for q in s.questions]} for s in SCENARIOS])
+
+
+async def questions(request):
+    return JSONResponse([_describe(q) for q in QUESTIONS.values()])
+
+
+async def question(request):
+    question_id, fmt = request.path_params["question_id"], _format(request)
+    if question_id not in QUESTIONS:
+        return JSONResponse({"error": f"unknown question {question_id!r}"}, status_code=404)
+    if fmt not in FORMATS:
+        return JSONResponse({"error": f"unknown format {fmt!r}", "formats": list(FORMATS)}, status_code=400)
+    body = await run_in_threadpool(_load, question_id, fmt)
+    return Response(body, media_type=FORMATS[fmt].media_type)
+
+
+async def refresh(request):
+    changed = await run_in_threadpool(data.refresh)
+    return JSONResponse({"changed": {table: [list(p) for p in parts] for table, parts in changed.items()},
+                         "failed": dict(data.refresh_failures)})
+
+
+async def health(request):
+    return JSONResponse({"caches": data.cache_stats()})
+
+
+async def prometheus(request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Same PHONEPE_WARMUP behaviour as the dashboard.
+    await run_in_threadpool(data.start_warm_up)
+    yield
+
+
+app = Starlette(routes=[
+    Route("/scenarios", scenarios),
+    Route("/questions", questions),
+    Route("/questions/{question_id}", question),
+    Route("/refresh", refresh, methods=["POST"]),
+    Route("/health", health),
+    Route("/metrics", prometheus),
+], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
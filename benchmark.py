@@ -0,0 +1,235 @@
+"""Benchmark of the load path, the 25 questions and figure serialization.
+
+For every scale (see synthetic.py) the tables are generated once into a
+SQLite stand-in database and an Arrow snapshot under --workdir. Each
+(scale, source) pair is then measured in a fresh process, so caches, pools
+and peak memory start from zero:
+
+  * load      reading each table the app keeps in memory (data.load_table;
+              none in sql mode against the database), rollup builds
+  * questions computing every question's aggregation (data.compute) cold,
+              with the rollup and result caches cleared before every call,
+              so it includes the SQL push-down or the rollup build; each
+              question is labelled with the path it took
+  * questions_warm  the same with its rollup already cached
+  * figures   building each chart (charts.build_figure) and serializing it
+              to the JSON sent to the browser
+
+Every step records its median wall time over --repeat runs and its peak
+traced memory (tracemalloc) in a separate run. Results are written as JSON;
+`compare` flags steps that got slower between two result files.
+
+    python benchmark.py --scales 1 10 100 --out bench.json
+    python benchmark.py compare baseline.json bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+SOURCES = ("database", "snapshot")
+
+
+# -------------------------------
+# Measurement (runs inside the per-source worker process)
+# -------------------------------
+def _measure(fn, repeat):
+    """Median seconds of `repeat` untraced calls, then one traced call for peak memory."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, {"seconds": statistics.median(times), "peak_bytes": peak}
+
+
+def _worker(repeat):
+    import pandas as pd
+
+    import charts
+    import config
+    import data
+    import rollups
+    from queries import TABLES
+    from questions import QUESTIONS
+
+    def load(table):
+        data.table_cache.invalidate(table)
+        return data.load_table(table)
+
+    def build(rollup):
+        data.rollup_cache.invalidate(rollup.name)
+        return data.load_rollup(rollup)
+
+    def cold(agg):
+        data.result_cache.clear()
+        data.rollup_cache.clear()
+        return data.compute(agg)
+
+    def path(agg):
+        """How data.compute answers `agg`: "sql" or "pandas", from which rollup if any."""
+        source = "pandas" if data._in_memory(agg.table) else "sql"
+        rollup = data._covering(agg)
+        return f"{source} rollup {rollup.name}" if rollup is not None else source
+
+    result = {"query_mode": config.QUERY_MODE, "rollups": config.ROLLUPS, "rows": {}, "load": {},
+              "rollup_builds": {}, "questions": {}, "questions_warm": {}, "figures": {}}
+    start = time.perf_counter()
+    for table in TABLES:
+        # Whole tables are only read when questions on them run in pandas.
+        if not data._in_memory(table):
+            continue
+        df, stats = _measure(lambda: load(table), repeat)
+        result["rows"][table] = len(df)
+        result["load"][table] = stats
+    if config.ROLLUPS == "build":
+        for rollup in rollups.ROLLUPS:
+            _, result["rollup_builds"][rollup.name] = _measure(lambda: build(rollup), repeat)
+    result["load_total_seconds"] = time.perf_counter() - start
+
+    for qid, question in QUESTIONS.items():
+        df, stats = _measure(lambda: cold(question.query), repeat)
+        result["questions"][qid] = {**stats, "rows": len(df), "path": path(question.query)}
+        _, result["questions_warm"][qid] = _measure(lambda: data.compute(question.query), repeat)
+
+        fig, build_stats = _measure(lambda: charts.build_figure(question, df), repeat)
+        payload, json_stats = _measure(fig.to_json, repeat)
+        result["figures"][qid] = {
+            "build_seconds": build_stats["seconds"],
+            "serialize_seconds": json_stats["seconds"],
+            "seconds": build_stats["seconds"] + json_stats["seconds"],
+            "peak_bytes": max(build_stats["peak_bytes"], json_stats["peak_bytes"]),
+            "payload_bytes": len(payload.encode("utf-8")),
+        }
+
+    # ru_maxrss is in kilobytes on Linux.
+    result["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    result["pandas"] = pd.__version__
+    return result
+
+
+# -------------------------------
+# Harness
+# -------------------------------
+def _prepare(scale, workdir):
+    """Generate the tables at `scale` once; returns (database URL, snapshot dir)."""
+    import snapshot
+    import synthetic
+    from db import make_engine
+
+    database = os.path.join(workdir, f"phonepe_{scale}x.db")
+    snapshot_dir = os.path.join(workdir, f"snapshot_{scale}x")
+    if not (os.path.exists(database) and os.path.exists(os.path.join(snapshot_dir, "manifest.json"))):
+        frames = synthetic.tables(scale)
+        synthetic.write_database(frames, make_engine(f"sqlite:///{database}"))
+        snapshot.write(frames.items(), snapshot_dir)
+    return f"sqlite:///{database}", snapshot_dir
+
+
+def _run_source(source, url, snapshot_dir, args):
+    env = dict(os.environ, PHONEPE_DATABASE_URL=url, PHONEPE_QUERY_MODE=args.query_mode,
+               PHONEPE_ROLLUPS=args.rollups, PHONEPE_REFRESH_INTERVAL="0")
+    if source == "snapshot":
+        env.update(PHONEPE_SNAPSHOT_DIR=snapshot_dir, PHONEPE_SNAPSHOT_MAX_AGE="0")
+    else:
+        env["PHONEPE_SNAPSHOT_DIR"] = os.path.join(args.workdir, "no-snapshot")
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "worker", str(args.repeat)],
+                         env=env, check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout)
+
+
+def run(args):
+    # Workers run from the repository, so paths handed to them must be absolute.
+    args.workdir = os.path.abspath(args.workdir)
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "runs": [],
+    }
+    for scale in args.scales:
+        url, snapshot_dir = _prepare(scale, args.workdir)
+        for source in args.sources:
+            measured = _run_source(source, url, snapshot_dir, args)
+            results["runs"].append({"scale": scale, "source": source, **measured})
+            print(f"{scale:>4}x {source:9} load {measured['load_total_seconds']:.3f}s, "
+                  f"questions {sum(q['seconds'] for q in measured['questions'].values()):.3f}s cold, "
+                  f"{sum(q['seconds'] for q in measured['questions_warm'].values()):.3f}s warm, "
+                  f"figures {sum(f['seconds'] for f in measured['figures'].values()):.3f}s, "
+                  f"max RSS {measured['max_rss_bytes'] / 2**20:.0f} MB", file=sys.stderr)
+    return results
+
+
+# -------------------------------
+# Comparison
+# -------------------------------
+def _steps(results):
+    for run in results["runs"]:
+        for section in ("load", "rollup_builds", "questions", "questions_warm", "figures"):
+            for name, stats in run.get(section, {}).items():
+                yield (run["scale"], run["source"], section, name), stats
+
+
+def compare(baseline, current, tolerance, min_seconds=0.001):
+    """Steps whose time or peak memory grew by more than `tolerance` (a fraction)."""
+    before = dict(_steps(baseline))
+    regressions = []
+    for key, stats in _steps(current):
+        old = before.get(key)
+        if old is None:
+            continue
+        for metric, floor in (("seconds", min_seconds), ("peak_bytes", 1024)):
+            if stats[metric] > max(old[metric], floor) * (1 + tolerance):
+                regressions.append((*key, metric, old[metric], stats[metric]))
+    return regressions
+
+
+def _parse(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--query-mode", choices=("sql", "pandas"), default="sql")
+    parser.add_argument("--rollups", choices=("build", "off"), default="build")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", default="benchmark_data")
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["worker"]:
+        json.dump(_worker(int(sys.argv[2])), sys.stdout)
+    elif sys.argv[1:2] == ["compare"]:
+        if len(sys.argv) not in (4, 5):
+            sys.exit("usage: python benchmark.py compare <baseline.json> <current.json> [tolerance]")
+        with open(sys.argv[2]) as f, open(sys.argv[3]) as g:
+            found = compare(json.load(f), json.load(g), float(sys.argv[4]) if len(sys.argv) == 5 else 0.2)
+        for scale, source, section, name, metric, old, new in found:
+            print(f"{scale}x {source} {section}/{name} {metric}: {old:.4g} -> {new:.4g}")
+        sys.exit(1 if found else 0)
+    else:
+        args = _parse(sys.argv[1:])
+        results = run(args)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
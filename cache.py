@@ -0,0 +1,166 @@
+"""Size-bounded, TTL-evicting LRU cache shared by every Streamlit session.
+
+Unlike `st.cache_data`, entries expire after `ttl` seconds, the total size
+is capped at `max_bytes` (least recently used entries are evicted first) and
+hit/miss/eviction counters are kept so the cache can be sized per worker.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def size_of(value):
+    """Approximate in-memory size of a cached value, in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    def __init__(self, ttl=None, max_bytes=None, name="cache"):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()   # key -> (value, size, stored_at)
+        self._loading = {}              # key -> lock held while the key is being loaded
+        self._generations = {}          # key being loaded -> times it was invalidated or put since
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries and not self._expired(self._entries[key])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry[2] > self.ttl
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = size_of(value)
+        with self._lock:
+            # Newer than whatever a load in flight will return.
+            self._outdate(key)
+            return self._store(key, value, size)
+
+    def _store(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            # A value larger than the whole budget is returned but never stored.
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self.max_bytes is not None and self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def _outdate(self, key):
+        """Keep a load of `key` in flight, if any, from storing its value."""
+        if key in self._generations:
+            self._generations[key] += 1
+
+    def _peek(self, key, default):
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None or self._expired(entry) else entry[0]
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss.
+
+        Concurrent misses on the same key run `loader()` once; the other
+        callers wait for its result. If `key` is invalidated (or put) while
+        `loader()` runs, its value may predate the change: it is returned to
+        the callers but not stored.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._peek(key, missing)
+            if value is missing:
+                try:
+                    with self._lock:
+                        self._generations[key] = 0
+                    value = loader()
+                    size = size_of(value)
+                    with self._lock:
+                        if self._generations[key] == 0:
+                            self._store(key, value, size)
+                finally:
+                    with self._lock:
+                        self._generations.pop(key, None)
+                        self._loading.pop(key, None)
+        return value
+
+    def is_loading(self, key):
+        """True while some thread is loading `key` through `get_or_load`."""
+        return key in self._loading
+
+    def invalidate(self, key):
+        with self._lock:
+            self._outdate(key)
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key satisfies `predicate`."""
+        with self._lock:
+            for key in [k for k in self._generations if predicate(k)]:
+                self._outdate(key)
+            for key in [k for k in self._entries if predicate(k)]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in self._generations:
+                self._outdate(key)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,70 @@
+"""Plotly figures for the questions of the registry (questions.py).
+
+In the default "fast" rendering mode (PHONEPE_RENDER_MODE) large charts are
+reduced on the server before they are sent to the browser: sunburst inputs
+are summed to one row per path, and scatters switch to WebGL above
+PHONEPE_SCATTER_WEBGL_ROWS points and are thinned to PHONEPE_CHART_POINT_BUDGET
+points with a density-preserving sample.
+"""
+import logging
+
+import pandas as pd
+import plotly.express as px
+
+import config
+
+log = logging.getLogger(__name__)
+
+# Grid used by `downsample`: every occupied cell keeps at least one point.
+_GRID_BINS = 64
+
+
+def downsample(df, x, y, budget, seed=0):
+    """Reduce a scatter's rows to `budget` while keeping its shape.
+
+    The plane is cut into a grid and one point of every occupied cell is
+    kept, so sparse regions and outliers survive; the rest of the budget is
+    a uniform random sample of the remaining rows, so dense regions stay
+    proportionally dense.
+    """
+    if not budget or len(df) <= budget:
+        return df
+    cells = pd.DataFrame({"x": pd.cut(df[x], _GRID_BINS, labels=False),
+                          "y": pd.cut(df[y], _GRID_BINS, labels=False)}, index=df.index)
+    anchors = cells.drop_duplicates().index
+    if len(anchors) >= budget:
+        keep = anchors.to_series().sample(budget, random_state=seed).index
+    else:
+        rest = df.index.difference(anchors).to_series()
+        keep = anchors.append(rest.sample(budget - len(anchors), random_state=seed).index)
+    return df.loc[keep.sort_values()]
+
+
+def _prepare(kind, df, options):
+    """Reduce `df` for the browser in "fast" mode; returns (df, extra plotly arguments)."""
+    if config.RENDER_MODE != "fast":
+        return df, {}
+    if kind == "sunburst" and "values" in options:
+        path = list(options["path"])
+        if df.duplicated(path).any():
+            df = df.groupby(path, observed=True, as_index=False)[options["values"]].sum()
+        return df, {}
+    if kind == "scatter":
+        extra = {"render_mode": "webgl" if len(df) > config.SCATTER_WEBGL_ROWS else "svg"}
+        return downsample(df, options["x"], options["y"], config.CHART_POINT_BUDGET), extra
+    return df, {}
+
+
+def build_figure(question, df):
+    """Draw a question's result as declared by its Chart spec."""
+    chart = question.chart
+    options = {name: list(value) if isinstance(value, tuple) else value for name, value in chart.options}
+    plotted, extra = _prepare(chart.kind, df, options)
+    if len(plotted) < len(df):
+        log.debug("%s: plotting %d of %d rows", question.id, len(plotted), len(df))
+    return getattr(px, chart.kind)(plotted, title=chart.title, **options, **extra)
+
+
+def payload_size(fig):
+    """Bytes of JSON the figure sends to the browser."""
+    return len(fig.to_json().encode("utf-8"))
@@ -0,0 +1,94 @@
+"""Runtime settings, read from environment variables with sensible defaults."""
+import os
+
+
+def _float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _int(name, default):
+    return int(_float(name, default))
+
+
+def _bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Database connection. PHONEPE_DATABASE_URL overrides the individual
+# settings, e.g. `sqlite:///phonepe.db` for a local stand-in database.
+DB_USER = os.environ.get("PHONEPE_DB_USER", "ansari")
+DB_PASSWORD = os.environ.get("PHONEPE_DB_PASSWORD", "1234")
+DB_HOST = os.environ.get("PHONEPE_DB_HOST", "localhost")
+DB_PORT = os.environ.get("PHONEPE_DB_PORT", "5433")
+DB_NAME = os.environ.get("PHONEPE_DB_NAME", "phonepe_pulse")
+DATABASE_URL = os.environ.get("PHONEPE_DATABASE_URL") or (
+    f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+# Connection pool and query limits (ignored by SQLite).
+DB_POOL_SIZE = _int("PHONEPE_DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _int("PHONEPE_DB_MAX_OVERFLOW", 10)
+DB_POOL_RECYCLE = _int("PHONEPE_DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = _bool("PHONEPE_DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT = _float("PHONEPE_DB_STATEMENT_TIMEOUT", 60)   # seconds, 0 = none
+
+# Cold-start warm-up (data.warm_up): tables, rollups and question results are
+# loaded by WARMUP_WORKERS threads sharing the pool. "background" starts it
+# when the app starts and renders pages as soon as their own data is ready,
+# "blocking" waits for all of it before the first page, "off" loads lazily.
+WARMUP = os.environ.get("PHONEPE_WARMUP", "background")
+WARMUP_WORKERS = _int("PHONEPE_WARMUP_WORKERS", DB_POOL_SIZE)
+
+# Rows per chunk when streaming whole tables through a server-side cursor.
+READ_CHUNKSIZE = _int("PHONEPE_READ_CHUNKSIZE", 50000)
+
+
+# Where question results are computed: "sql" pushes each aggregation down to
+# PostgreSQL, "pandas" loads the source table once and aggregates in memory.
+QUERY_MODE = os.environ.get("PHONEPE_QUERY_MODE", "sql")
+
+# Rollups questions are answered from: "build" computes each rollup once with
+# the QUERY_MODE above, "views" reads the PostgreSQL materialized views
+# (`python rollups.py create`), "off" answers every question from raw tables.
+ROLLUPS = os.environ.get("PHONEPE_ROLLUPS", "build")
+
+# Seconds between incremental checks for newly landed quarters; 0 disables
+# them (data.refresh() can still be called explicitly).
+REFRESH_INTERVAL = _float("PHONEPE_REFRESH_INTERVAL", 0)
+
+# Columnar snapshot (`python snapshot.py export`). Tables are read from it
+# while it is younger than SNAPSHOT_MAX_AGE seconds (0 = never stale), and
+# from PostgreSQL otherwise or when the snapshot is missing.
+SNAPSHOT_DIR = os.environ.get("PHONEPE_SNAPSHOT_DIR", "snapshot")
+SNAPSHOT_MAX_AGE = _float("PHONEPE_SNAPSHOT_MAX_AGE", 24 * 3600)
+
+# Chart rendering. "fast" pre-aggregates sunburst inputs to their path, draws
+# scatters with WebGL above SCATTER_WEBGL_ROWS points and thins them to
+# CHART_POINT_BUDGET points (0 = no limit); "full" sends every row.
+RENDER_MODE = os.environ.get("PHONEPE_RENDER_MODE", "fast")
+SCATTER_WEBGL_ROWS = _int("PHONEPE_SCATTER_WEBGL_ROWS", 1000)
+CHART_POINT_BUDGET = _int("PHONEPE_CHART_POINT_BUDGET", 5000)
+
+# Instrumentation (see metrics.py): request records kept for the debug panel,
+# JSON log lines, per-stage tracemalloc peaks, a Prometheus text file and a
+# /metrics port (0 = off).
+METRICS_HISTORY = _int("PHONEPE_METRICS_HISTORY", 100)
+METRICS_LOG = _bool("PHONEPE_METRICS_LOG", False)
+METRICS_MEMORY = _bool("PHONEPE_METRICS_MEMORY", False)
+METRICS_FILE = os.environ.get("PHONEPE_METRICS_FILE", "")
+METRICS_PORT = _int("PHONEPE_METRICS_PORT", 0)
+
+# Cache sizing (seconds / megabytes); 0 disables the limit. Each cache has
+# its own cap, so the process holds at most the sum of them.
+CACHE_TTL = _float("PHONEPE_CACHE_TTL", 3600) or None
+TABLE_CACHE_MB = _float("PHONEPE_TABLE_CACHE_MB", 512) or None
+ROLLUP_CACHE_MB = _float("PHONEPE_ROLLUP_CACHE_MB", 128) or None
+QUESTION_CACHE_MB = _float("PHONEPE_QUESTION_CACHE_MB", 64) or None
+OUTPUT_CACHE_MB = _float("PHONEPE_OUTPUT_CACHE_MB", 64) or None
+
+
+def megabytes(mb):
+    return int(mb * 1024 * 1024) if mb else None
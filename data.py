@@ -0,0 +1,429 @@
+"""Lazy, cached access to tables, rollups and question results.
+
+Tables are fetched the first time a question needs them rather than all at
+startup, from the columnar snapshot while it is fresh (see snapshot.py) and
+from PostgreSQL otherwise. Tables served from the snapshot are aggregated
+in memory, so the dashboard also runs with no database. Questions covered
+by a rollup (see rollups.py) are answered from the smallest such rollup.
+Questions are declared in questions.py and all run through `load_result`;
+a scenario's questions can be fetched in one batched round trip with
+`prefetch`, and `warm_up` loads everything in parallel ahead of time (on a
+background thread at app start by default). Tables, rollups, results and
+encoded outputs live in size-bounded TTL caches (see cache.py) shared by
+every session in the process.
+
+`refresh()` picks up newly landed quarters incrementally: only new or
+changed (Year, Quarter) partitions are read (see ingest.py), merged into the
+cached tables and rollups, and only the results on those tables are
+invalidated.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+
+import config
+import ingest
+import metrics
+import rollups
+import schema
+import snapshot
+from cache import TTLCache
+from db import engine, read_table
+from queries import TABLES, aggregate, run_batch
+from questions import QUESTIONS
+
+log = logging.getLogger(__name__)
+
+# Always on from pandas 3.0; makes the shallow copies handed out below safe to modify.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+table_cache = TTLCache(ttl=config.CACHE_TTL, max_bytes=config.megabytes(config.TABLE_CACHE_MB),
+                       name="tables")
+rollup_cache = TTLCache(ttl=config.CACHE_TTL, max_bytes=config.megabytes(config.ROLLUP_CACHE_MB),
+                        name="rollups")
+# Keyed by the Aggregation itself, so questions asking the same thing share a result.
+result_cache = TTLCache(ttl=config.CACHE_TTL, max_bytes=config.megabytes(config.QUESTION_CACHE_MB),
+                        name="results")
+# Encoded results and figures served by the API and the export (see export.py),
+# and the dashboard's chart payload sizes.
+output_cache = TTLCache(ttl=config.CACHE_TTL, max_bytes=config.megabytes(config.OUTPUT_CACHE_MB),
+                        name="outputs")
+metrics.register_caches(table_cache, rollup_cache, result_cache, output_cache)
+
+
+# Tables served from a stale snapshot because the database was unreachable.
+_offline = set()
+
+
+def _in_memory(table):
+    """True when questions on `table` are aggregated in pandas, not pushed down."""
+    return config.QUERY_MODE == "pandas" or table in _offline or snapshot.is_fresh(table)
+
+
+def _track(table):
+    if ingest.is_tracked(table):
+        return
+    if table in _offline or snapshot.is_fresh(table):
+        ingest.seed(table, snapshot.partitions(table))
+    else:
+        ingest.track(table)
+
+
+def _push_down(aggs, tables=()):
+    """Run aggregations in one round trip, marking each table queried for the first time.
+
+    The mark (ingest.latest_partition) rides in the same statement, so
+    tracking a table costs no round trip of its own.
+    """
+    aggs = list(aggs)
+    new = [t for t in dict.fromkeys([*tables, *(agg.table for agg in aggs)]) if ingest.needs_mark(t)]
+    frames = run_batch([ingest.latest_partition(t) for t in new] + aggs, engine)
+    for table, df in zip(new, frames):
+        ingest.mark(table, df)
+    return frames[len(new):]
+
+
+def _go_offline(table):
+    """After a failed database read, serve `table` from a stale snapshot if there is one."""
+    if not snapshot.exists(table):
+        return False
+    log.warning("Database unavailable, serving %s from a stale snapshot", table)
+    _offline.add(table)
+    return True
+
+
+def _read_snapshot(name):
+    """Read `name` from the snapshot, including the quarters refreshed since.
+
+    The snapshot file does not have partitions that `refresh()` merged into
+    an earlier copy (evicted since), so tracking is reset to the snapshot's
+    fingerprints and those partitions are fetched again. If the database is
+    unreachable they are left to the next refresh.
+    """
+    with metrics.stage("snapshot"):
+        df = schema.enforce(name, snapshot.read_table(name))
+    base = snapshot.partitions(name)
+    with _refresh_lock:
+        tracked = ingest.known_partitions(name)
+        ingest.forget(name)
+        ingest.seed(name, base)
+        if tracked is None or tracked == base:
+            return df
+        try:
+            partitions, fingerprints = ingest.changed_partitions(name, engine, full=True)
+            if partitions:
+                with metrics.stage("read_sql"):
+                    new_rows = schema.enforce(name, ingest.fetch_partitions(name, partitions, engine))
+                df = _merge_partitions(name, df, partitions, new_rows)
+            ingest.record(name, fingerprints)
+        except SQLAlchemyError as exc:
+            # Tracking stays at the snapshot's, so the next refresh fetches them.
+            log.warning("Could not re-apply refreshed quarters of %s: %s", name, exc)
+    return df
+
+
+def _read_table(name):
+    if not (name in _offline or snapshot.is_fresh(name)):
+        try:
+            with metrics.stage("read_sql"):
+                df = read_table(name, engine)
+        except SQLAlchemyError:
+            if not _go_offline(name):
+                raise
+        else:
+            if ingest.high_water_mark(name) is None:
+                # First read: the frame fingerprints itself, no extra query.
+                ingest.seed(name, ingest.fingerprints_of(name, df))
+            return schema.derive(name, df)
+    return schema.derive(name, _read_snapshot(name))
+
+
+def load_table(name):
+    """Return the full table, reading it on first use."""
+    if name not in TABLES:
+        raise ValueError(f"Unknown table: {name!r}")
+    _track(name)
+    return table_cache.get_or_load(name, lambda: _read_table(name))
+
+
+def _build_rollup(rollup):
+    if not _in_memory(rollup.table):
+        try:
+            with metrics.stage("read_sql"):
+                if config.ROLLUPS == "views":
+                    _push_down([], tables=[rollup.table])
+                    return rollups.read_view(rollup, engine)
+                return _push_down([rollup.aggregation])[0]
+        except SQLAlchemyError:
+            if not _go_offline(rollup.table):
+                raise
+    df = load_table(rollup.table)
+    with metrics.stage("pandas"):
+        return aggregate(rollup.aggregation, df)
+
+
+def load_rollup(rollup):
+    """Return a rollup frame, building it on first use."""
+    _track(rollup.table)
+    return rollup_cache.get_or_load(rollup.name, lambda: _build_rollup(rollup))
+
+
+def build_rollups():
+    """Build every rollup up front, e.g. before serving traffic."""
+    return {r.name: load_rollup(r) for r in rollups.ROLLUPS}
+
+
+def _covering(agg):
+    return rollups.covering(agg) if config.ROLLUPS != "off" else None
+
+
+def compute(agg):
+    """Compute an aggregation without consulting the result cache."""
+    _track(agg.table)
+    rollup = _covering(agg)
+    if rollup is not None:
+        df = load_rollup(rollup)
+        with metrics.stage("pandas"):
+            return rollups.answer(agg, df)
+    if not _in_memory(agg.table):
+        try:
+            with metrics.stage("read_sql"):
+                return _push_down([agg])[0]
+        except SQLAlchemyError:
+            if not _go_offline(agg.table):
+                raise
+    df = load_table(agg.table)
+    with metrics.stage("pandas"):
+        return aggregate(agg, df)
+
+
+def load_result(agg):
+    """Return the result of an aggregation, cached per distinct aggregation.
+
+    The result is a shallow copy: with copy-on-write, a caller that adds or
+    overwrites columns changes only its own copy, never the cached frame
+    other sessions read.
+    """
+    return result_cache.get_or_load(agg, lambda: compute(agg)).copy(deep=False)
+
+
+def load_question(question_id):
+    """Return the result of a registered question (see questions.py)."""
+    return load_result(QUESTIONS[question_id].query)
+
+
+def load_output(question_id, fmt, encode):
+    """Return `encode(question, result)`, cached per (format, question) until its table changes."""
+    question = QUESTIONS[question_id]
+    return output_cache.get_or_load((fmt, question_id),
+                                    lambda: encode(question, load_result(question.query)))
+
+
+def prefetch(questions):
+    """Warm the caches for `questions`, e.g. every question of a scenario.
+
+    Everything that has to be pushed down to the database (rollups to build
+    and aggregations no rollup covers) is sent as a single batched statement
+    instead of one round trip per question; the rest is answered from
+    memory as usual.
+    """
+    aggs = list(dict.fromkeys(q.query for q in questions))
+    pending = {}   # cache key -> (cache, aggregation), in batch order
+    for agg in aggs:
+        if agg in result_cache or result_cache.is_loading(agg):
+            continue
+        _track(agg.table)
+        rollup = _covering(agg)
+        if rollup is not None:
+            if (config.ROLLUPS == "build" and not _in_memory(rollup.table)
+                    and rollup.name not in rollup_cache and not rollup_cache.is_loading(rollup.name)):
+                pending[rollup.name] = (rollup_cache, rollup.aggregation)
+        elif not _in_memory(agg.table):
+            pending[agg] = (result_cache, agg)
+
+    if len(pending) > 1:
+        try:
+            with metrics.stage("read_sql"):
+                frames = _push_down([agg for _, agg in pending.values()])
+        except SQLAlchemyError:
+            # Served below from the stale snapshots instead.
+            tables = dict.fromkeys(agg.table for _, agg in pending.values())
+            if not all([_go_offline(table) for table in tables]):
+                raise
+        else:
+            for (key, (cache, _)), df in zip(pending.items(), frames):
+                cache.put(key, df)
+    for agg in aggs:
+        load_result(agg)
+
+
+# -------------------------------
+# Warm-up
+# -------------------------------
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def _warm_table(table):
+    _track(table)
+    if _in_memory(table):
+        load_table(table)
+
+
+def warm_up(questions=None, workers=None):
+    """Load tables, rollups and question results in parallel over the pool.
+
+    Tasks are queued tables first, then rollups, then results; a task that
+    needs something another worker is still loading waits for it (see
+    TTLCache.get_or_load) instead of loading it again. Returns
+    `{task: seconds}`; failures are logged and left to the lazy path.
+    """
+    questions = QUESTIONS.values() if questions is None else questions
+    aggs = list(dict.fromkeys(q.query for q in questions))
+    covering = [r for r in dict.fromkeys(map(_covering, aggs)) if r is not None]
+    tasks = ([(f"table {t}", _warm_table, t) for t in dict.fromkeys(a.table for a in aggs)]
+             + [(f"rollup {r.name}", load_rollup, r) for r in covering]
+             + [(f"result {a.table} {a.columns}", load_result, a) for a in aggs])
+
+    def timed(fn, arg):
+        start = time.perf_counter()
+        fn(arg)
+        return time.perf_counter() - start
+
+    timings = {}
+    with ThreadPoolExecutor(max_workers=workers or config.WARMUP_WORKERS,
+                            thread_name_prefix="warm-up") as pool:
+        futures = {pool.submit(timed, fn, arg): name for name, fn, arg in tasks}
+        for future in as_completed(futures):
+            try:
+                timings[futures[future]] = future.result()
+            except Exception as exc:
+                log.warning("Warm-up of %s failed: %s", futures[future], exc)
+    return timings
+
+
+def start_warm_up():
+    """Start `warm_up` as PHONEPE_WARMUP says, once per process.
+
+    In "background" mode it runs on a daemon thread and pages render as
+    soon as their own data is loaded; "blocking" waits for all of it.
+    """
+    global _warm_up_thread
+    if config.WARMUP not in ("background", "blocking"):
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+    if config.WARMUP == "blocking":
+        _warm_up_thread.join()
+    return _warm_up_thread
+
+
+# -------------------------------
+# Incremental refresh
+# -------------------------------
+_refresh_lock = threading.RLock()
+_last_refresh = time.monotonic()
+
+
+def _merge_partitions(table, df, partitions, new_rows):
+    """Replace the given partitions of `df`, a frame of `table` or of one of its rollups."""
+    kept = df[~ingest.in_partitions(df, partitions)]
+    return schema.concat(table, [kept, new_rows])
+
+
+def _refresh_table(table, full):
+    partitions, fingerprints = ingest.changed_partitions(table, engine, full=full)
+    if not partitions:
+        ingest.record(table, fingerprints)   # a first check sets the baseline
+        return partitions
+
+    # Rollups keyed by (Year, Quarter) can swap the changed partitions in
+    # place; coarser ones cannot separate them out and are rebuilt lazily.
+    cached_rollups = [r for r in rollups.ROLLUPS if r.table == table and r.name in rollup_cache]
+    built_locally = config.ROLLUPS == "build" or _in_memory(table)
+    mergeable = [r for r in cached_rollups
+                 if built_locally and set(ingest.PARTITION_KEYS) <= set(r.dimensions)]
+
+    if table in table_cache or mergeable:
+        new_rows = schema.derive(table, schema.enforce(table, ingest.fetch_partitions(table, partitions, engine)))
+        cached = table_cache.get(table)
+        if cached is not None:
+            table_cache.put(table, _merge_partitions(table, cached, partitions, new_rows))
+        for rollup in mergeable:
+            current = rollup_cache.get(rollup.name)
+            if current is not None:
+                merged = _merge_partitions(table, current, partitions, aggregate(rollup.aggregation, new_rows))
+                rollup_cache.put(rollup.name, merged.sort_values(list(rollup.dimensions), ignore_index=True))
+
+    if config.ROLLUPS == "views" and not _in_memory(table):
+        rollups.refresh_views(engine, table)
+    # Invalidating what is not cached still stops a load in flight, which
+    # may have read the table before the refresh, from being stored.
+    if table not in table_cache:
+        table_cache.invalidate(table)
+    for rollup in rollups.ROLLUPS:
+        if rollup.table == table and rollup not in mergeable:
+            rollup_cache.invalidate(rollup.name)
+
+    result_cache.invalidate_where(lambda agg: agg.table == table)
+    output_cache.invalidate_where(lambda key: QUESTIONS[key[1]].query.table == table)
+    # Only now: if anything above fails, the next refresh sees the partitions again.
+    ingest.record(table, fingerprints)
+    return partitions
+
+
+# Tables the last refresh could not check, e.g. in DB-less mode: {table: error}.
+refresh_failures = {}
+
+
+def refresh(full=False):
+    """Pull new or changed quarters into every tracked table.
+
+    Returns `{table: [(year, quarter), ...]}` for the tables that changed.
+    Tables whose database check fails are logged, listed in
+    `refresh_failures` and skipped; they keep serving what they have.
+    """
+    global _last_refresh
+    with _refresh_lock:
+        changed = {}
+        refresh_failures.clear()
+        for table in TABLES:
+            if not ingest.is_tracked(table):
+                continue
+            try:
+                partitions = _refresh_table(table, full)
+            except SQLAlchemyError as exc:
+                log.warning("Could not refresh %s: %s", table, exc)
+                refresh_failures[table] = str(exc).splitlines()[0]
+                continue
+            if partitions:
+                changed[table] = partitions
+        _last_refresh = time.monotonic()
+        return changed
+
+
+def refresh_if_due():
+    """Run `refresh()` when PHONEPE_REFRESH_INTERVAL seconds have passed."""
+    if config.REFRESH_INTERVAL and time.monotonic() - _last_refresh >= config.REFRESH_INTERVAL:
+        return refresh()
+    return {}
+
+
+def cache_stats():
+    return [table_cache.stats(), rollup_cache.stats(), result_cache.stats(), output_cache.stats()]
+
+
+def clear_caches():
+    table_cache.clear()
+    rollup_cache.clear()
+    result_cache.clear()
+    output_cache.clear()
+    ingest.forget()
+    _offline.clear()
@@ -0,0 +1,71 @@
+"""Database engine shared by the dashboard and the query layer.
+
+The connection URL, pool size, pre-ping and statement timeout come from
+config.py (environment variables). Whole tables are streamed through a
+server-side cursor in chunks that are compacted (schema.py) as they arrive,
+so peak memory while loading tracks the compact frame rather than the raw
+result set.
+
+Any SQLAlchemy URL works as a stand-in backend for tests and CI, e.g.
+`PHONEPE_DATABASE_URL=sqlite:///phonepe.db`; copy the tables into one with
+
+    python db.py copy sqlite:///phonepe.db
+"""
+import sys
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+import config
+import schema
+from queries import TABLES, quote
+
+
+def make_engine(url=None):
+    """Create an engine for `url` (default: PHONEPE_DATABASE_URL) with the configured pool."""
+    url = make_url(url or config.DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        return create_engine(url)
+
+    options = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == "postgresql" and config.DB_STATEMENT_TIMEOUT:
+        timeout_ms = int(config.DB_STATEMENT_TIMEOUT * 1000)
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return create_engine(url, **options)
+
+
+engine = make_engine()
+
+
+def read_table(name, bind=None, chunksize=None):
+    """Read a whole table in chunks through a server-side cursor, in its compact schema."""
+    bind = bind or engine
+    chunksize = chunksize or config.READ_CHUNKSIZE
+    sql = text(f"SELECT * FROM {quote(name)}")
+    with bind.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+        chunks = [schema.enforce(name, chunk) for chunk in pd.read_sql(sql, conn, chunksize=chunksize)]
+    return schema.concat(name, chunks)
+
+
+def copy_tables(source, target, tables=TABLES):
+    """Copy tables between databases chunk by chunk, e.g. into a local stand-in."""
+    for table in tables:
+        sql = text(f"SELECT * FROM {quote(table)}")
+        with source.connect().execution_options(stream_results=True) as conn:
+            mode = "replace"
+            for chunk in pd.read_sql(sql, conn, chunksize=config.READ_CHUNKSIZE):
+                chunk.to_sql(table, target, if_exists=mode, index=False)
+                mode = "append"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "copy":
+        sys.exit("usage: python db.py copy <target-url>")
+    copy_tables(engine, make_engine(sys.argv[2]))
+    print(f"Copied {len(TABLES)} tables to {sys.argv[2]}")
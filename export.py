@@ -0,0 +1,91 @@
+"""Question results and figures outside Streamlit.
+
+The encodings below are shared by the HTTP API (api.py) and the batch
+export, and go through data.load_output, so each (format, question) is
+encoded once per result and reused until its table is refreshed.
+
+    python export.py out/                 # every question in every format
+    python export.py out/ json arrow      # only some formats
+
+writes `<question>.<suffix>` files plus an index.json describing them.
+"""
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+import pyarrow as pa
+
+import data
+from charts import build_figure
+from questions import SCENARIOS
+
+
+@dataclass(frozen=True)
+class Format:
+    encode: object        # (question, result frame) -> bytes
+    media_type: str
+    suffix: str
+
+
+def to_json(question, df):
+    return df.to_json(orient="records").encode("utf-8")
+
+
+def to_arrow(question, df):
+    """Arrow IPC stream; categoricals stay dictionary-encoded."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_figure(question, df):
+    """Plotly figure JSON, ready for Plotly.newPlot in any client."""
+    return build_figure(question, df).to_json().encode("utf-8")
+
+
+def to_html(question, df):
+    """Standalone chart page loading plotly.js from its CDN."""
+    return build_figure(question, df).to_html(include_plotlyjs="cdn").encode("utf-8")
+
+
+FORMATS = {
+    "json": Format(to_json, "application/json", ".json"),
+    "arrow": Format(to_arrow, "application/vnd.apache.arrow.stream", ".arrow"),
+    "figure": Format(to_figure, "application/json", ".figure.json"),
+    "html": Format(to_html, "text/html; charset=utf-8", ".html"),
+}
+
+
+def encode(question_id, fmt):
+    """Bytes of one question's result in `fmt` (see FORMATS), cached."""
+    return data.load_output(question_id, fmt, FORMATS[fmt].encode)
+
+
+def export(directory, formats=tuple(FORMATS)):
+    """Write every question in `formats` to `directory`; returns the index."""
+    os.makedirs(directory, exist_ok=True)
+    data.warm_up()
+    index = []
+    for scenario in SCENARIOS:
+        for question in scenario.questions:
+            files = {}
+            for fmt in formats:
+                files[fmt] = question.id + FORMATS[fmt].suffix
+                with open(os.path.join(directory, files[fmt]), "wb") as f:
+                    f.write(encode(question.id, fmt))
+            index.append({"id": question.id, "scenario": scenario.title, "label": question.label,
+                          "chart": question.chart.title, "files": files})
+
+    with open(os.path.join(directory, "index.json"), "w") as f:
+        json.dump({"questions": index}, f, indent=2)
+    return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or any(fmt not in FORMATS for fmt in sys.argv[2:]):
+        sys.exit(f"usage: python export.py <directory> [{'|'.join(FORMATS)} ...]")
+    index = export(sys.argv[1], tuple(sys.argv[2:]) or tuple(FORMATS))
+    print(f"Wrote {len(index)} questions to {sys.argv[1]}")
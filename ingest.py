@@ -0,0 +1,182 @@
+"""Partition tracking for incremental refresh of newly landed quarters.
+
+Every table is partitioned by (Year, Quarter). For each tracked table we
+keep a fingerprint per partition (row count and the sum of every measure
+column) and the high-water mark, the latest partition seen.
+`changed_partitions` compares the database against those fingerprints so
+only new or restated quarters are re-read; data.refresh() merges them into
+the cached frames and then `record`s the new fingerprints.
+
+Tracking starts without a query of its own: a table read whole is seeded
+from the frame itself (`fingerprints_of`), a snapshot from its manifest. A
+table only queried through push-down records just its latest partition, in
+the same statement as its first query (`latest_partition`), and is
+fingerprinted by its first refresh: partitions past that mark are new, but
+history restated before the first refresh is not detected.
+"""
+import math
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+
+import schema
+from queries import Aggregation, quote
+
+PARTITION_KEYS = ("Year", "Quarter")
+
+_partitions = {}   # table -> {(year, quarter): (rows, checksum)}, None until fingerprinted
+_marks = {}        # table -> latest (year, quarter) at first use, until fingerprinted
+_lock = threading.Lock()
+
+
+def measure_columns(table):
+    """Columns summed into each partition's fingerprint: every non-dimension column."""
+    return [c for c, dtype in schema.SCHEMAS[table].items()
+            if dtype != "category" and c not in PARTITION_KEYS]
+
+
+def _fingerprints(table, engine, since=None):
+    sums = "".join(f", SUM({quote(c)}) AS sum_{i}" for i, c in enumerate(measure_columns(table)))
+    year, quarter = (quote(k) for k in PARTITION_KEYS)
+    sql = f"SELECT {year}, {quarter}, COUNT(*) AS row_count{sums} FROM {quote(table)}"
+    params = {}
+    if since is not None:
+        sql += f" WHERE {year} > :year OR ({year} = :year AND {quarter} >= :quarter)"
+        params = {"year": int(since[0]), "quarter": int(since[1])}
+    sql += f" GROUP BY {year}, {quarter}"
+    df = pd.read_sql(text(sql), engine, params=params)
+    return {(int(y), int(q)): (int(n), tuple(float(c or 0) for c in sums))
+            for y, q, n, *sums in df.itertuples(index=False)}
+
+
+def fingerprints_of(table, df):
+    """Per-partition fingerprints of an in-memory copy of `table`."""
+    grouped = df.groupby(list(PARTITION_KEYS), observed=True)
+    sums = grouped[measure_columns(table)].sum()
+    sizes = grouped.size()
+    return {(int(y), int(q)): (int(sizes[(y, q)]), tuple(float(c) for c in row))
+            for (y, q), *row in sums.itertuples()}
+
+
+def _same(a, b):
+    return (a[0] == b[0] and len(a[1]) == len(b[1])
+            and all(math.isclose(x, y, rel_tol=1e-9) for x, y in zip(a[1], b[1])))
+
+
+def is_tracked(table):
+    return table in _partitions
+
+
+def track(table):
+    """Start tracking `table`; it is fingerprinted by `seed` or the first `changed_partitions`."""
+    with _lock:
+        _partitions.setdefault(table, None)
+
+
+def seed(table, partitions):
+    """Track `table` from known fingerprints, e.g. a snapshot's, unless it already has some."""
+    with _lock:
+        if _partitions.get(table) is None:
+            _partitions[table] = dict(partitions)
+            _marks.pop(table, None)
+
+
+def needs_mark(table):
+    """True for a tracked table with neither fingerprints nor a latest partition yet."""
+    return table in _partitions and _partitions[table] is None and table not in _marks
+
+
+def latest_partition(table):
+    """The aggregation selecting the latest (Year, Quarter) of `table`, for `mark`."""
+    return Aggregation(table, group_by=PARTITION_KEYS, order_by=tuple((k, False) for k in PARTITION_KEYS),
+                       limit=1)
+
+
+def mark(table, df):
+    """Record the result of `latest_partition` as the point a later refresh continues from."""
+    latest = tuple(int(v) for v in df.iloc[0]) if len(df) else (0, 0)
+    with _lock:
+        if _partitions.get(table, ()) is None:
+            _marks.setdefault(table, latest)
+
+
+def known_partitions(table):
+    """The fingerprints currently tracked for `table`, or None when it is not tracked."""
+    parts = _partitions.get(table)
+    return dict(parts) if parts is not None else None
+
+
+def high_water_mark(table):
+    """Latest (Year, Quarter) seen for a tracked table, or None."""
+    parts = _partitions.get(table)
+    return max(parts) if parts else None
+
+
+def changed_partitions(table, engine, full=False):
+    """Return the sorted new or changed (Year, Quarter) partitions and the fingerprints to record.
+
+    By default only partitions at or above the high-water mark are checked;
+    the latest quarter is re-checked because it may have been loaded in
+    several batches. `full=True` also detects restated or deleted history.
+    Nothing is recorded here: pass the fingerprints to `record` once the
+    partitions are merged, so a failed merge is retried by the next check.
+    """
+    if table not in _partitions:
+        return [], None
+    known = _partitions[table]
+    if known is None:
+        # First check of a table tracked without fingerprints: everything
+        # past its mark is new, the rest is the baseline.
+        current = _fingerprints(table, engine)
+        latest = _marks.get(table)
+        return sorted(p for p in current if latest is not None and p > latest), current
+    since = None if full or not known else max(known)
+    current = _fingerprints(table, engine, since)
+
+    changed = {p for p, fp in current.items() if p not in known or not _same(fp, known[p])}
+    if full:
+        changed |= set(known) - set(current)
+
+    fingerprints = dict(known)
+    for p in changed:
+        if p in current:
+            fingerprints[p] = current[p]
+        else:
+            fingerprints.pop(p, None)
+    return sorted(changed), fingerprints
+
+
+def record(table, fingerprints):
+    """Save fingerprints returned by `changed_partitions`, unless `table` was forgotten since."""
+    with _lock:
+        if table in _partitions:
+            _partitions[table] = dict(fingerprints)
+            _marks.pop(table, None)
+
+
+def fetch_partitions(table, partitions, engine):
+    """Read only the rows of the given (Year, Quarter) partitions."""
+    year, quarter = (quote(k) for k in PARTITION_KEYS)
+    clauses, params = [], {}
+    for i, (y, q) in enumerate(partitions):
+        clauses.append(f"({year} = :y{i} AND {quarter} = :q{i})")
+        params[f"y{i}"], params[f"q{i}"] = int(y), int(q)
+    sql = f"SELECT * FROM {quote(table)} WHERE {' OR '.join(clauses)}"
+    return pd.read_sql(text(sql), engine, params=params)
+
+
+def in_partitions(df, partitions):
+    """Boolean mask of the rows of `df` that fall in `partitions`."""
+    keys = pd.MultiIndex.from_frame(df[list(PARTITION_KEYS)].astype("int64"))
+    return keys.isin(list(partitions))
+
+
+def forget(table=None):
+    with _lock:
+        if table is None:
+            _partitions.clear()
+            _marks.clear()
+        else:
+            _partitions.pop(table, None)
+            _marks.pop(table, None)
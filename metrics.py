@@ -0,0 +1,201 @@
+"""Stage timings and memory for every question the dashboard renders.
+
+A render is wrapped in `request(scenario=..., question=...)` and each stage
+inside it (SQL reads, pandas aggregation, figure build, serialization,
+Streamlit rendering) in `stage(name)`. Stages are leaves and do not nest.
+For each request the process keeps:
+
+  * the last PHONEPE_METRICS_HISTORY request records (the app's debug panel,
+    `?debug=1`),
+  * per (stage, question) totals, exposed in the Prometheus text format by
+    `render()`, written to PHONEPE_METRICS_FILE and served on
+    PHONEPE_METRICS_PORT at /metrics,
+  * a JSON log line per stage and per request when PHONEPE_METRICS_LOG is set.
+
+With PHONEPE_METRICS_MEMORY every stage also records its peak traced memory
+(tracemalloc), which slows allocation-heavy code noticeably. tracemalloc
+keeps one peak for the whole process, so a peak is only recorded for stages
+that ran while no other stage did; overlapping stages (concurrent sessions,
+API requests, warm-up) record none. Allocations made outside any stage by
+other threads still count, so the numbers are approximate under concurrency.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=config.METRICS_HISTORY)
+_totals = {}   # (stage, question) -> [count, seconds, peak bytes]
+_caches = []
+_server = None
+_memory_lock = threading.Lock()
+_memory = {"active": 0, "started": 0}   # stages running, stages ever started
+
+if config.METRICS_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+if config.METRICS_LOG and not log.handlers:
+    # One JSON object per line on stderr, whatever the host app's logging setup.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def register_caches(*caches):
+    """Include the hit/miss counters of these TTLCaches in `render()`."""
+    _caches.extend(caches)
+
+
+@contextmanager
+def request(**labels):
+    """Collect the stages timed inside into one request record."""
+    record = {"time": time.time(), **labels, "seconds": None, "stages": {}}
+    outer = getattr(_local, "request", None)
+    _local.request = record
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        _local.request = outer
+        with _lock:
+            _history.append(record)
+        if config.METRICS_LOG:
+            log.info(json.dumps({"event": "request", **record}))
+
+
+@contextmanager
+def stage(name):
+    """Time one stage of the current request (or of background work, outside one)."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        with _memory_lock:
+            _memory["active"] += 1
+            _memory["started"] += 1
+            started, exclusive = _memory["started"], _memory["active"] == 1
+            if exclusive:
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        peak = None
+        if tracing:
+            with _memory_lock:
+                # Another stage that started meanwhile has reset or shared the peak.
+                if exclusive and _memory["started"] == started:
+                    peak = tracemalloc.get_traced_memory()[1] - baseline
+                _memory["active"] -= 1
+        _record(name, seconds, peak)
+
+
+def _record(name, seconds, peak):
+    record = getattr(_local, "request", None)
+    question = record.get("question", "") if record else ""
+    with _lock:
+        if record is not None:
+            stages = record["stages"]
+            stages[name] = stages.get(name, 0.0) + seconds
+            if peak is not None:
+                record["peak_bytes"] = max(record.get("peak_bytes", 0), peak)
+        totals = _totals.setdefault((name, question), [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], peak or 0)
+    if config.METRICS_LOG:
+        log.info(json.dumps({"event": "stage", "stage": name, "question": question,
+                             "seconds": seconds, "peak_bytes": peak}))
+
+
+def history():
+    """The last requests, newest first, one flat row each (stage seconds as columns)."""
+    with _lock:
+        records = list(_history)
+    return [{k: v for k, v in r.items() if k != "stages"} | r["stages"] for r in reversed(records)]
+
+
+# -------------------------------
+# Prometheus text format
+# -------------------------------
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = ["# HELP phonepe_stage_seconds Time spent in each stage of a question.",
+             "# TYPE phonepe_stage_seconds summary"]
+    with _lock:
+        totals = sorted(_totals.items())
+    for (name, question), (count, seconds, _) in totals:
+        labels = _labels(stage=name, question=question)
+        lines.append(f"phonepe_stage_seconds_count{{{labels}}} {count}")
+        lines.append(f"phonepe_stage_seconds_sum{{{labels}}} {seconds:.6f}")
+    if tracemalloc.is_tracing():
+        lines += ["# HELP phonepe_stage_peak_bytes Largest traced allocation peak of a stage.",
+                  "# TYPE phonepe_stage_peak_bytes gauge"]
+        for (name, question), (_, _, peak) in totals:
+            lines.append(f"phonepe_stage_peak_bytes{{{_labels(stage=name, question=question)}}} {peak}")
+
+    for metric, kind, key in (("hits_total", "counter", "hits"), ("misses_total", "counter", "misses"),
+                              ("evictions_total", "counter", "evictions"), ("bytes", "gauge", "bytes"),
+                              ("entries", "gauge", "entries")):
+        lines.append(f"# TYPE phonepe_cache_{metric} {kind}")
+        for cache in _caches:
+            stats = cache.stats()
+            lines.append(f"phonepe_cache_{metric}{{{_labels(cache=stats['name'])}}} {stats[key]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path=None):
+    """Write `render()` to PHONEPE_METRICS_FILE (e.g. for node_exporter's textfile collector)."""
+    path = path or config.METRICS_FILE
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def serve(port=None):
+    """Serve /metrics on PHONEPE_METRICS_PORT from a daemon thread, once per process."""
+    global _server
+    port = port or config.METRICS_PORT
+    with _lock:
+        if not port or _server is not None:
+            return _server
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
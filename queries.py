@@ -0,0 +1,196 @@
+"""Aggregation push-down for the dashboard's business questions.
+
+Every question declares the aggregation it plots (group keys, measures,
+sort order and top-N; see questions.py). `to_sql` turns that declaration
+into a parameterized GROUP BY / ORDER BY / LIMIT statement so PostgreSQL
+returns only the rows the chart needs instead of whole tables, and
+`run_batch` sends several of them in a single round trip.
+"""
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+
+# -------------------------------
+# Tables the dashboard is allowed to query
+# -------------------------------
+TABLES = (
+    "aggregated_insurance",
+    "aggregated_transaction",
+    "aggregated_user",
+    "map_insurance",
+    "map_transaction",
+    "top_insurance_dist",
+    "top_transaction_dist",
+)
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_SQL_FUNCS = {"sum": "SUM", "mean": "AVG", "count": "COUNT", "min": "MIN", "max": "MAX"}
+
+
+def quote(name):
+    """Quote a column/table name, rejecting anything that is not a plain identifier."""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+@dataclass(frozen=True)
+class Measure:
+    """An aggregated output column.
+
+    `per` turns the measure into a smoothed ratio, `column / (per + 1)`,
+    evaluated row by row before aggregating. A `count` over column `"*"`
+    counts source rows.
+    """
+    column: str
+    agg: str = "sum"
+    name: str = None
+    per: str = None
+
+    @property
+    def label(self):
+        return self.name or self.column
+
+    def to_sql(self):
+        if self.agg not in _SQL_FUNCS:
+            raise ValueError(f"Unsupported aggregation: {self.agg!r}")
+        expr = "*" if self.column == "*" else quote(self.column)
+        if self.per:
+            expr = f"{expr} * 1.0 / ({quote(self.per)} + 1)"
+        return f"{_SQL_FUNCS[self.agg]}({expr}) AS {quote(self.label)}"
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    """The rows one question needs from one table.
+
+    With `measures` the query is a GROUP BY over `group_by`; without them it
+    is a plain projection of `group_by` (used by the scatter plots, which
+    need one point per source row).
+    """
+    table: str
+    group_by: tuple = ()
+    measures: tuple = ()
+    order_by: tuple = ()   # (column, ascending) pairs
+    limit: int = None
+
+    @property
+    def columns(self):
+        return list(self.group_by) + [m.label for m in self.measures]
+
+    @property
+    def sort_order(self):
+        """(column, ascending) pairs; without an explicit order, the group keys like pandas' groupby."""
+        return list(self.order_by) or ([(c, True) for c in self.group_by] if self.measures else [])
+
+    def to_sql(self, suffix=""):
+        """Return `(sql, params)`; `suffix` keeps parameter names unique within a batch."""
+        if self.table not in TABLES:
+            raise ValueError(f"Unknown table: {self.table!r}")
+
+        keys = [quote(c) for c in self.group_by]
+        select = keys + [m.to_sql() for m in self.measures]
+        sql = f"SELECT {', '.join(select)} FROM {quote(self.table)}"
+        if self.measures and keys:
+            sql += f" GROUP BY {', '.join(keys)}"
+        if self.sort_order:
+            order = [f"{quote(c)} {'ASC' if asc else 'DESC'}" for c, asc in self.sort_order]
+            sql += f" ORDER BY {', '.join(order)}"
+
+        params = {}
+        if self.limit is not None:
+            sql += f" LIMIT :limit{suffix}"
+            params[f"limit{suffix}"] = int(self.limit)
+        return sql, params
+
+
+def run_query(agg, engine):
+    """Execute an aggregation on the database and return the result frame."""
+    sql, params = agg.to_sql()
+    df = pd.read_sql(text(sql), engine, params=params)
+    # PostgreSQL returns SUM(bigint) as NUMERIC, which arrives as Decimal objects.
+    for m in agg.measures:
+        df[m.label] = pd.to_numeric(df[m.label])
+    return df
+
+
+def run_batch(aggs, engine):
+    """Execute several aggregations in one round trip; returns one frame per aggregation.
+
+    The statements are combined with UNION ALL over the union of their
+    columns (NULL where a statement lacks one) plus a batch index. Each
+    frame is then built from its own rows only, so its dtypes are the ones
+    `run_query` would give rather than floats widened by another
+    statement's NULL padding.
+    """
+    aggs = list(aggs)
+    if len(aggs) <= 1:
+        return [run_query(agg, engine) for agg in aggs]
+
+    columns = list(dict.fromkeys(c for agg in aggs for c in agg.columns))
+    selects, params = [], {}
+    for i, agg in enumerate(aggs):
+        sql, agg_params = agg.to_sql(suffix=f"_{i}")
+        values = [quote(c) if c in agg.columns else f"NULL AS {quote(c)}" for c in columns]
+        selects.append(f"SELECT {i} AS batch_index, {', '.join(values)} FROM ({sql}) AS q{i}")
+        params.update(agg_params)
+    with engine.connect() as conn:
+        rows = conn.execute(text(" UNION ALL ".join(selects)), params).fetchall()
+
+    by_index = [[] for _ in aggs]
+    for row in rows:
+        by_index[row[0]].append(row[1:])
+    results = []
+    for agg, agg_rows in zip(aggs, by_index):
+        positions = [columns.index(c) for c in agg.columns]
+        part = pd.DataFrame.from_records([tuple(row[k] for k in positions) for row in agg_rows],
+                                         columns=agg.columns, coerce_float=True)
+        for m in agg.measures:
+            part[m.label] = pd.to_numeric(part[m.label])
+        if agg.sort_order:
+            part = part.sort_values(by=[c for c, _ in agg.sort_order],
+                                    ascending=[asc for _, asc in agg.sort_order])
+        results.append(part.reset_index(drop=True))
+    return results
+
+
+def aggregate(agg, df):
+    """Evaluate an aggregation on an in-memory table; mirrors `to_sql`."""
+    keys = list(agg.group_by)
+    if not agg.measures:
+        out = df[keys]
+    else:
+        values = {k: df[k] for k in keys}
+        for m in agg.measures:
+            if m.column == "*":
+                values[m.label] = 1
+            elif m.per and m.label in df:
+                # Precomputed when the table was loaded (schema.derive).
+                values[m.label] = df[m.label]
+            else:
+                # Widen first: `per` may be a downcast int8/int16 column (see schema.py).
+                values[m.label] = df[m.column] / (df[m.per].astype("float64") + 1) if m.per else df[m.column]
+        funcs = {m.label: m.agg for m in agg.measures}
+        out = pd.DataFrame(values).groupby(keys, observed=True).agg(funcs).reset_index()
+
+    if agg.order_by:
+        out = out.sort_values(by=[c for c, _ in agg.order_by],
+                              ascending=[asc for _, asc in agg.order_by])
+    if agg.limit is not None:
+        out = out.head(agg.limit)
+    return out.reset_index(drop=True)
+
+
+# -------------------------------
+# Measures shared by the question registry and the rollups
+# -------------------------------
+AMOUNT = Measure("Transaction_Amount")
+COUNT = Measure("Transaction_Count")
+USERS = Measure("Registered_Users")
+OPENS = Measure("App_Opens")
+ENGAGEMENT = Measure("App_Opens", "mean", name="Engagement_Ratio", per="Registered_Users")
+AVG_VALUE = Measure("Transaction_Amount", "mean", name="Avg_Transaction_Value", per="Transaction_Count")
+
@@ -0,0 +1,206 @@
+"""Declarative registry of the dashboard's scenarios and business questions.
+
+Each question is a spec: the aggregation it needs (source table, group
+keys, measures, sort order, top-N; see queries.py) and the chart it is
+drawn as. A single executor (data.load_result) runs any spec, so questions
+that ask for the same aggregation in different scenarios share one cached
+result, and a scenario's questions can be prefetched together
+(data.prefetch).
+"""
+from dataclasses import dataclass
+
+from queries import AMOUNT, AVG_VALUE, COUNT, ENGAGEMENT, OPENS, USERS, Aggregation
+
+
+@dataclass(frozen=True)
+class Chart:
+    kind: str              # plotly express function: bar, line, pie, sunburst, scatter
+    title: str
+    options: tuple = ()    # (argument, value) pairs passed to plotly express
+
+
+@dataclass(frozen=True)
+class Question:
+    id: str
+    label: str
+    query: Aggregation
+    chart: Chart
+
+
+@dataclass(frozen=True)
+class Scenario:
+    id: str
+    title: str
+    description: str
+    questions: tuple
+
+
+def chart(kind, title, **options):
+    return Chart(kind, title, tuple(options.items()))
+
+
+def top(table, key, measure, n=None, ascending=False):
+    """Aggregation of `measure` by `key`, sorted by the measure and cut to the top `n`."""
+    return Aggregation(table, (key,), (measure,), ((measure.label, ascending),), n)
+
+
+# -------------------------------
+# Queries asked by more than one scenario
+# -------------------------------
+TRANSACTION_TYPE_BY_STATE = Aggregation("aggregated_transaction", ("State", "Transaction_Type"), (AMOUNT,))
+TOP_TRANSACTION_DISTRICTS = top("map_transaction", "District", AMOUNT, 10)
+USERS_BY_STATE_YEAR = Aggregation("aggregated_user", ("State", "Year"), (USERS,))
+OPENS_BY_QUARTER = Aggregation("aggregated_user", ("Year", "Quarter"), (OPENS,))
+USER_POINTS = Aggregation("aggregated_user", ("Registered_Users", "App_Opens", "Year", "State", "Quarter"))
+
+# -------------------------------
+# Scenario descriptions (markdown)
+# -------------------------------
+_S1 = """\
+### 📘 Scenario 1: Decoding Transaction Dynamics on PhonePe
+PhonePe identified variations in transaction behavior across states, quarters, and payment categories.  
+The goal is to analyze these variations and uncover actionable insights.
+"""
+
+_S2 = """\
+### 📱 Scenario 2: Device Dominance and User Engagement Analysis
+PhonePe aims to understand how user engagement varies across different device brands and regions.
+The objective is to analyze how registered users and app opens differ by device usage trends.
+"""
+
+_S3 = """\
+### 🧾 Scenario 3: Insurance Penetration and Growth Potential Analysis
+PhonePe has ventured into the insurance domain, providing users with policy options.  
+This analysis explores the growth trajectory of insurance transactions and identifies  
+untapped opportunities for expansion across states.
+"""
+
+_S4 = """\
+### 🌍 Scenario 4: Transaction Analysis for Market Expansion
+PhonePe aims to understand transaction behavior across states and districts to identify 
+potential markets for expansion. This analysis highlights regions with high activity 
+and areas showing untapped growth opportunities.
+"""
+
+_S5 = """\
+### 👥 Scenario 5: User Engagement and Growth Strategy
+PhonePe aims to enhance its market position by analyzing user engagement metrics across states.
+This analysis explores trends in registered users and app opens to uncover key growth opportunities.
+"""
+
+SCENARIOS = (
+    Scenario("transaction_dynamics", "Decoding Transaction Dynamics on PhonePe", _S1, (
+        Question("s1q1", "Q1: Which states have the highest transaction amounts over years?",
+                 Aggregation("aggregated_transaction", ("Year", "State"), (AMOUNT,)),
+                 chart("bar", "Transaction Amount by State and Year",
+                       x="State", y="Transaction_Amount", color="Year", barmode="group")),
+        Question("s1q2", "Q2: How does transaction type vary across states?",
+                 TRANSACTION_TYPE_BY_STATE,
+                 chart("sunburst", "Transaction Type Distribution by State",
+                       path=("State", "Transaction_Type"), values="Transaction_Amount")),
+        Question("s1q3", "Q3: How have user registrations and app opens changed over time?",
+                 Aggregation("aggregated_user", ("Year", "Quarter"), (USERS, OPENS)),
+                 chart("line", "User Growth and App Opens Over Time",
+                       x="Year", y=("Registered_Users", "App_Opens"), markers=True)),
+        Question("s1q4", "Q4: What is the distribution of insurance transactions by state?",
+                 Aggregation("aggregated_insurance", ("State",), (AMOUNT,)),
+                 chart("pie", "Insurance Transaction Amount by State",
+                       names="State", values="Transaction_Amount")),
+        Question("s1q5", "Q5: Which districts contribute most to total transaction volume?",
+                 TOP_TRANSACTION_DISTRICTS,
+                 chart("bar", "Top 10 Districts by Transaction Amount",
+                       x="District", y="Transaction_Amount", color="Transaction_Amount")),
+    )),
+    Scenario("device_engagement", "Device Dominance and User Engagement Analysis", _S2, (
+        Question("s2q1", "Q1: How do registered users vary across states and years?",
+                 USERS_BY_STATE_YEAR,
+                 chart("bar", "Registered Users by State and Year",
+                       x="State", y="Registered_Users", color="Year", barmode="group")),
+        Question("s2q2", "Q2: Which states show the highest app engagement (App Opens)?",
+                 top("aggregated_user", "State", OPENS, 10),
+                 chart("bar", "Top 10 States by App Engagement (App Opens)",
+                       x="State", y="App_Opens", color="App_Opens")),
+        Question("s2q3", "Q3: What is the relationship between registered users and app opens?",
+                 USER_POINTS,
+                 chart("scatter", "Correlation between Registered Users and App Opens",
+                       x="Registered_Users", y="App_Opens", color="Year", hover_data=("State", "Quarter"))),
+        Question("s2q4", "Q4: How does user engagement vary quarterly across years?",
+                 OPENS_BY_QUARTER,
+                 chart("line", "Quarterly App Engagement Over Years",
+                       x="Quarter", y="App_Opens", color="Year", markers=True)),
+        Question("s2q5", "Q5: What are the top underperforming regions in terms of app opens vs registered users?",
+                 top("aggregated_user", "State", ENGAGEMENT, 10, ascending=True),
+                 chart("bar", "Top 10 Underperforming States (App Opens / Registered Users)",
+                       x="State", y="Engagement_Ratio", color="Engagement_Ratio")),
+    )),
+    Scenario("insurance_growth", "Insurance Penetration and Growth Potential Analysis", _S3, (
+        Question("s3q1", "Q1: Which states show the highest total insurance transaction amounts?",
+                 top("aggregated_insurance", "State", AMOUNT),
+                 chart("bar", "Total Insurance Transaction Amount by State",
+                       x="State", y="Transaction_Amount", color="Transaction_Amount")),
+        Question("s3q2", "Q2: How has insurance transaction volume grown over time across states?",
+                 Aggregation("aggregated_insurance", ("Year", "State"), (COUNT,)),
+                 chart("line", "Insurance Transaction Volume Growth by State",
+                       x="Year", y="Transaction_Count", color="State", markers=True)),
+        Question("s3q3", "Q3: Which districts are driving the majority of insurance transactions?",
+                 top("map_insurance", "District", AMOUNT, 10),
+                 chart("bar", "Top 10 Districts Driving Insurance Transactions",
+                       x="District", y="Transaction_Amount", color="Transaction_Amount")),
+        Question("s3q4", "Q4: What are the top-performing districts by insurance transaction amount?",
+                 top("top_insurance_dist", "District", AMOUNT),
+                 chart("bar", "Top Performing Districts in Insurance Transactions",
+                       x="District", y="Transaction_Amount", color="Transaction_Amount")),
+        Question("s3q5", "Q5: Which states have the highest average transaction amount per insurance policy?",
+                 top("aggregated_insurance", "State", AVG_VALUE),
+                 chart("bar", "Average Insurance Transaction Value per State",
+                       x="State", y="Avg_Transaction_Value", color="Avg_Transaction_Value")),
+    )),
+    Scenario("market_expansion", "Transaction Analysis for Market Expansion", _S4, (
+        Question("s4q1", "Q1: Which states record the highest total transaction amounts across years?",
+                 top("aggregated_transaction", "State", AMOUNT),
+                 chart("bar", "Total Transaction Amount by State",
+                       x="State", y="Transaction_Amount", color="Transaction_Amount")),
+        Question("s4q2", "Q2: How has total transaction volume changed over time?",
+                 Aggregation("aggregated_transaction", ("Year",), (COUNT,)),
+                 chart("line", "Transaction Volume Growth Over Years",
+                       x="Year", y="Transaction_Count", markers=True)),
+        Question("s4q3", "Q3: Which transaction types dominate across different states?",
+                 TRANSACTION_TYPE_BY_STATE,
+                 chart("sunburst", "Dominant Transaction Types Across States",
+                       path=("State", "Transaction_Type"), values="Transaction_Amount")),
+        Question("s4q4", "Q4: Which districts contribute most to total transaction volume?",
+                 TOP_TRANSACTION_DISTRICTS,
+                 chart("bar", "Top 10 Districts by Transaction Volume",
+                       x="District", y="Transaction_Amount", color="Transaction_Amount")),
+        Question("s4q5", "Q5: What are the top 10 districts showing potential for market expansion?",
+                 top("top_transaction_dist", "District", AMOUNT, 10, ascending=True),
+                 chart("bar", "Top 10 Emerging Districts for Market Expansion",
+                       x="District", y="Transaction_Amount", color="Transaction_Amount")),
+    )),
+    Scenario("user_growth", "User Engagement and Growth Strategy", _S5, (
+        Question("s5q1", "Q1: Which states have the highest number of registered users over time?",
+                 USERS_BY_STATE_YEAR,
+                 chart("bar", "Registered Users by State and Year",
+                       x="State", y="Registered_Users", color="Year", barmode="group")),
+        Question("s5q2", "Q2: How has app engagement evolved across years and quarters?",
+                 OPENS_BY_QUARTER,
+                 chart("line", "App Engagement Over Time (Yearly & Quarterly)",
+                       x="Quarter", y="App_Opens", color="Year", markers=True)),
+        Question("s5q3", "Q3: What is the relationship between registered users and app opens across states?",
+                 USER_POINTS,
+                 chart("scatter", "Correlation Between Registered Users and App Opens",
+                       x="Registered_Users", y="App_Opens", color="Year", hover_data=("State", "Quarter"))),
+        Question("s5q4", "Q4: Which states show the strongest growth in user registration?",
+                 Aggregation("aggregated_user", ("State", "Year"), (USERS,),
+                             (("Year", True), ("Registered_Users", False))),
+                 chart("line", "Yearly Growth in Registered Users by State",
+                       x="Year", y="Registered_Users", color="State", markers=True)),
+        Question("s5q5", "Q5: Which states have the highest app engagement ratio (App Opens per Registered User)?",
+                 top("aggregated_user", "State", ENGAGEMENT),
+                 chart("bar", "App Engagement Ratio by State (App Opens per Registered User)",
+                       x="State", y="Engagement_Ratio", color="Engagement_Ratio")),
+    )),
+)
+
+QUESTIONS = {q.id: q for s in SCENARIOS for q in s.questions}
+SCENARIOS_BY_TITLE = {s.title: s for s in SCENARIOS}
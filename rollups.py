@@ -0,0 +1,144 @@
+"""Pre-aggregated rollups ("cubes") the dashboard answers questions from.
+
+Most questions re-aggregate the same few cubes: State x Year sums of
+Transaction_Amount, Year x Quarter sums of App_Opens, district totals. Each
+rollup here is computed once (from PostgreSQL materialized views, a GROUP BY
+push-down, or an in-memory table) and every covered question is answered by
+re-aggregating the smallest rollup that contains its keys and measures, so
+its cost no longer depends on how many raw quarterly rows are ingested.
+
+Materialized views are managed from the command line:
+
+    python rollups.py create     # CREATE MATERIALIZED VIEW for every rollup
+    python rollups.py refresh    # REFRESH MATERIALIZED VIEW after new data lands
+    python rollups.py drop
+"""
+import sys
+from dataclasses import dataclass, replace
+
+import pandas as pd
+from sqlalchemy import text
+
+from queries import AMOUNT, AVG_VALUE, COUNT, ENGAGEMENT, OPENS, USERS, Aggregation, Measure, quote
+
+ROWS = Measure("*", "count", name="Row_Count")
+
+
+def _summed(measure):
+    # Ratio means are stored as a sum of ratios; dividing by Row_Count recovers the mean.
+    return replace(measure, agg="sum")
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    table: str
+    dimensions: tuple
+    measures: tuple
+
+    @property
+    def view(self):
+        return f"rollup_{self.name}"
+
+    @property
+    def aggregation(self):
+        """The GROUP BY that materializes this rollup from its base table."""
+        stored = tuple(_summed(m) for m in self.measures)
+        if any(m.agg == "mean" for m in self.measures):
+            stored += (ROWS,)
+        return Aggregation(self.table, self.dimensions, stored)
+
+    def covers(self, agg):
+        if agg.table != self.table or not agg.measures:
+            return False
+        if not set(agg.group_by) <= set(self.dimensions):
+            return False
+        stored = self.aggregation.measures
+        return all(_summed(m) in stored and (m.agg == "sum" or (m.agg == "mean" and ROWS in stored))
+                   for m in agg.measures)
+
+
+ROLLUPS = (
+    Rollup("transaction_state_year", "aggregated_transaction", ("Year", "State"), (AMOUNT, COUNT)),
+    Rollup("transaction_cube", "aggregated_transaction",
+           ("Year", "Quarter", "State", "Transaction_Type"), (AMOUNT, COUNT)),
+    Rollup("user_year_quarter", "aggregated_user", ("Year", "Quarter"), (USERS, OPENS)),
+    Rollup("user_cube", "aggregated_user", ("Year", "Quarter", "State"), (USERS, OPENS, ENGAGEMENT)),
+    Rollup("insurance_cube", "aggregated_insurance", ("Year", "Quarter", "State"), (AMOUNT, COUNT, AVG_VALUE)),
+    Rollup("map_transaction_district", "map_transaction", ("District",), (AMOUNT,)),
+    Rollup("map_insurance_district", "map_insurance", ("District",), (AMOUNT,)),
+    Rollup("top_transaction_district", "top_transaction_dist", ("District",), (AMOUNT,)),
+    Rollup("top_insurance_district", "top_insurance_dist", ("District",), (AMOUNT,)),
+)
+
+
+def covering(agg):
+    """Return the smallest rollup that can answer `agg`, or None.
+
+    Rollups of one table differ only in how many dimensions they keep, so
+    the one with the fewest dimensions is also the one with the fewest rows.
+    """
+    candidates = [r for r in ROLLUPS if r.covers(agg)]
+    return min(candidates, key=lambda r: len(r.dimensions)) if candidates else None
+
+
+def answer(agg, rollup_df):
+    """Evaluate `agg` by re-aggregating a rollup frame built for a covering rollup."""
+    labels = [m.label for m in agg.measures]
+    needs_rows = any(m.agg == "mean" for m in agg.measures)
+    out = rollup_df.groupby(list(agg.group_by), observed=True)[
+        labels + ([ROWS.label] if needs_rows else [])].sum()
+    for m in agg.measures:
+        if m.agg == "mean":
+            out[m.label] = out[m.label] / out[ROWS.label]
+    out = out[labels].reset_index()
+
+    if agg.order_by:
+        out = out.sort_values(by=[c for c, _ in agg.order_by],
+                              ascending=[asc for _, asc in agg.order_by])
+    if agg.limit is not None:
+        out = out.head(agg.limit)
+    return out.reset_index(drop=True)
+
+
+def read_view(rollup, engine):
+    """Read a rollup from its PostgreSQL materialized view."""
+    df = pd.read_sql(text(f"SELECT * FROM {quote(rollup.view)}"), engine)
+    for m in rollup.aggregation.measures:
+        df[m.label] = pd.to_numeric(df[m.label])
+    return df
+
+
+# -------------------------------
+# Materialized view management
+# -------------------------------
+def create_views(engine):
+    with engine.begin() as conn:
+        for rollup in ROLLUPS:
+            sql, _ = rollup.aggregation.to_sql()
+            conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {quote(rollup.view)} AS {sql}"))
+
+
+def refresh_views(engine, table=None):
+    """Refresh every rollup view, or only those built from `table`."""
+    with engine.begin() as conn:
+        for rollup in ROLLUPS:
+            if table is not None and rollup.table != table:
+                continue
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW {quote(rollup.view)}"))
+
+
+def drop_views(engine):
+    with engine.begin() as conn:
+        for rollup in ROLLUPS:
+            conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {quote(rollup.view)}"))
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    commands = {"create": create_views, "refresh": refresh_views, "drop": drop_views}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit(f"usage: python rollups.py [{'|'.join(commands)}]")
+    commands[sys.argv[1]](engine)
+    print(f"{sys.argv[1]}: {len(ROLLUPS)} rollup views")
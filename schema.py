@@ -0,0 +1,134 @@
+"""Compact dtype schema for the loaded tables.
+
+Default `read_sql` frames store every State/District/Transaction_Type value
+as a Python string and every number as 64 bits. The schema below declares
+categoricals for the dimensions and the narrowest numeric types for Year,
+Quarter and the measures. This shrinks each table several times over and
+lets groupbys work on integer codes instead of hashing strings. Amounts stay
+float64 so that summing them keeps full precision.
+
+The per-row ratios some questions average (Engagement_Ratio,
+Avg_Transaction_Value) are derived once when a table is loaded rather than
+on every rerun.
+
+    python schema.py    # memory of every table before and after
+"""
+import pandas as pd
+
+from queries import AVG_VALUE, ENGAGEMENT
+
+# "integer" downcasts to the narrowest integer type that fits the data.
+_DIMENSIONS = {"State": "category", "Year": "int16", "Quarter": "int8"}
+_TRANSACTIONS = {
+    **_DIMENSIONS,
+    "Transaction_Type": "category",
+    "Transaction_Count": "integer",
+    "Transaction_Amount": "float64",
+}
+_DISTRICTS = {
+    **_DIMENSIONS,
+    "District": "category",
+    "Transaction_Count": "integer",
+    "Transaction_Amount": "float64",
+}
+
+SCHEMAS = {
+    "aggregated_insurance": _TRANSACTIONS,
+    "aggregated_transaction": _TRANSACTIONS,
+    "aggregated_user": {**_DIMENSIONS, "Registered_Users": "integer", "App_Opens": "integer"},
+    "map_insurance": _DISTRICTS,
+    "map_transaction": _DISTRICTS,
+    "top_insurance_dist": _DISTRICTS,
+    "top_transaction_dist": _DISTRICTS,
+}
+
+# Ratio measures materialized as columns when a table is loaded.
+DERIVED = {
+    "aggregated_user": (ENGAGEMENT,),
+    "aggregated_insurance": (AVG_VALUE,),
+}
+
+
+def _convert(column, dtype):
+    """Return `column` converted to `dtype`, or None when it already conforms."""
+    if dtype == "category":
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            return column.astype("category")
+        # Keep categories sorted so groupby/sort order matches the database's.
+        categories = column.cat.categories
+        if not categories.is_monotonic_increasing:
+            return column.cat.set_categories(categories.sort_values())
+        return None
+    # Integer columns with missing values are left as they are.
+    if column.isna().any() and dtype != "float64":
+        return None
+    if dtype == "integer":
+        downcast = pd.to_numeric(column, downcast="integer")
+        return downcast if downcast.dtype != column.dtype else None
+    return column.astype(dtype) if column.dtype != dtype else None
+
+
+def enforce(table, df):
+    """Return `df` with the declared dtypes of `table`; the input is not modified."""
+    converted = {}
+    for name, dtype in SCHEMAS.get(table, {}).items():
+        if name in df:
+            column = _convert(df[name], dtype)
+            if column is not None:
+                converted[name] = column
+    return df.assign(**converted) if converted else df
+
+
+def derive(table, df):
+    """Return `df` with the derived ratio columns of `table` added (computed once)."""
+    missing = [m for m in DERIVED.get(table, ()) if m.label not in df and m.column in df and m.per in df]
+    if not missing:
+        return df
+    return df.assign(**{m.label: df[m.column] / (df[m.per].astype("float64") + 1) for m in missing})
+
+
+def concat(table, frames):
+    """Concatenate compact chunks of `table` without falling back to object columns.
+
+    Chunks carry different category sets; they are unified first so the
+    result stays categorical.
+    """
+    if not frames:
+        return pd.DataFrame()
+    categorical = [name for name, dtype in SCHEMAS.get(table, {}).items()
+                   if dtype == "category"
+                   and all(isinstance(f[name].dtype, pd.CategoricalDtype) for f in frames if name in f)
+                   and name in frames[0]]
+    if len(frames) > 1 and categorical:
+        categories = {name: pd.Index(sorted(set().union(*(f[name].cat.categories for f in frames))))
+                      for name in categorical}
+        frames = [f.assign(**{name: f[name].cat.set_categories(categories[name]) for name in categorical})
+                  for f in frames]
+    return enforce(table, pd.concat(frames, ignore_index=True))
+
+
+def memory_usage(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(frames):
+    """Memory before/after enforcing the schema, one row per table."""
+    rows = []
+    for table, df in frames.items():
+        before, after = memory_usage(df), memory_usage(enforce(table, df))
+        rows.append({"table": table, "rows": len(df), "before_mb": before / 2**20,
+                     "after_mb": after / 2**20, "saved": 1 - after / before if before else 0.0})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from sqlalchemy import text
+
+    from db import engine
+    from queries import TABLES, quote
+
+    frames = {t: pd.read_sql(text(f"SELECT * FROM {quote(t)}"), engine) for t in TABLES}
+    report = memory_report(frames)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    total_before, total_after = report["before_mb"].sum(), report["after_mb"].sum()
+    print(f"\nTotal: {total_before:.2f} MB -> {total_after:.2f} MB")
@@ -0,0 +1,129 @@
+"""Columnar on-disk snapshot of the seven tables.
+
+Each table is written as an uncompressed Arrow IPC file in the compact
+schema of schema.py, so State, District and Transaction_Type are
+dictionary-encoded. Reading maps the file into memory instead of copying
+it, so a new process starts in milliseconds and the dashboard can run with
+no PostgreSQL server at all. A manifest records when the snapshot was taken
+and the (Year, Quarter) fingerprints of every table, so incremental refresh
+(data.refresh) can continue from it.
+
+    python snapshot.py export    # write ./snapshot from PostgreSQL
+    python snapshot.py info      # show age and row counts
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import pyarrow as pa
+
+import config
+import db
+import ingest
+import schema
+from queries import TABLES
+
+_MANIFEST = "manifest.json"
+_manifest = (None, None)   # ((path, mtime), parsed manifest)
+_lock = threading.Lock()
+
+
+def _path(name, directory=None):
+    return os.path.join(directory or config.SNAPSHOT_DIR, name)
+
+
+def manifest():
+    """Return the snapshot manifest, or None when there is no snapshot."""
+    global _manifest
+    path = _path(_MANIFEST)
+    try:
+        version = (path, os.stat(path).st_mtime)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        if _manifest[0] != version:
+            with open(path) as f:
+                _manifest = (version, json.load(f))
+        return _manifest[1]
+
+
+def exists(table):
+    info = manifest()
+    return info is not None and table in info["tables"]
+
+
+def age():
+    """Seconds since the snapshot was taken, or None when there is none."""
+    info = manifest()
+    return time.time() - info["created_at"] if info else None
+
+
+def is_fresh(table):
+    """True when `table` is in a snapshot younger than PHONEPE_SNAPSHOT_MAX_AGE."""
+    if not exists(table):
+        return False
+    return not config.SNAPSHOT_MAX_AGE or age() <= config.SNAPSHOT_MAX_AGE
+
+
+def partitions(table):
+    """(Year, Quarter) fingerprints of `table` at snapshot time."""
+    return {(y, q): (n, tuple(sums)) for y, q, n, *sums in manifest()["tables"][table]["partitions"]}
+
+
+def read_table(table):
+    """Memory-map a snapshot table; numeric columns are zero-copy views of the file."""
+    source = pa.memory_map(_path(f"{table}.arrow"), "r")
+    arrow_table = pa.ipc.open_file(source).read_all()
+    return arrow_table.to_pandas(split_blocks=True)
+
+
+def write_table(table, df, directory=None):
+    """Write one table in its compact schema; categoricals become Arrow dictionaries."""
+    df = schema.enforce(table, df)
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+
+    tmp = _path(f"{table}.arrow.tmp", directory)
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    os.replace(tmp, _path(f"{table}.arrow", directory))
+    return {
+        "rows": len(df),
+        "partitions": [[y, q, n, *sums] for (y, q), (n, sums) in sorted(ingest.fingerprints_of(table, df).items())],
+    }
+
+
+def write(frames, directory=None):
+    """Write a snapshot of `frames`, (table, DataFrame) pairs, and its manifest."""
+    os.makedirs(directory or config.SNAPSHOT_DIR, exist_ok=True)
+    info = {"created_at": time.time(), "tables": {}}
+    for table, df in frames:
+        info["tables"][table] = write_table(table, df, directory)
+
+    tmp = _path(_MANIFEST + ".tmp", directory)
+    with open(tmp, "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp, _path(_MANIFEST, directory))
+    return info
+
+
+def export(engine, tables=TABLES):
+    """Write a fresh snapshot of `tables` from the database."""
+    return write((table, db.read_table(table, engine)) for table in tables)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    if command == "export":
+        info = export(db.engine)
+        print(f"Wrote {len(info['tables'])} tables to {config.SNAPSHOT_DIR}/")
+    elif command == "info":
+        info = manifest()
+        if info is None:
+            sys.exit(f"No snapshot in {config.SNAPSHOT_DIR}/")
+        print(f"Snapshot in {config.SNAPSHOT_DIR}/, taken {age() / 3600:.1f} h ago")
+        for table, meta in info["tables"].items():
+            print(f"  {table:24} {meta['rows']:>10,} rows, {len(meta['partitions'])} quarters")
+    else:
+        sys.exit("usage: python snapshot.py [export|info]")
@@ -0,0 +1,142 @@
+"""Synthetic PhonePe Pulse tables for benchmarks and local stand-ins.
+
+The seven tables are generated with the real cardinalities: 36 states and
+union territories, about 800 districts, five transaction types and
+quarterly partitions from 2018 Q1 (insurance from 2020 Q2). Values follow
+a per-state weight, steady quarter-on-quarter growth and log-normal noise,
+so rankings and trends look like the real data.
+
+`scale` multiplies the row count without changing any cardinality: every
+(State, Year, Quarter, ...) key is split into `scale` rows whose values add
+up to the key's total, as finer-grained source data would be.
+
+    python synthetic.py db 10 sqlite:///bench.db        # 10x into a database
+    python synthetic.py snapshot 10 bench_snapshot/     # 10x as an Arrow snapshot
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import schema
+import snapshot
+from queries import TABLES
+
+STATES = (
+    "andaman-&-nicobar-islands", "andhra-pradesh", "arunachal-pradesh", "assam", "bihar",
+    "chandigarh", "chhattisgarh", "dadra-&-nagar-haveli-&-daman-&-diu", "delhi", "goa",
+    "gujarat", "haryana", "himachal-pradesh", "jammu-&-kashmir", "jharkhand", "karnataka",
+    "kerala", "ladakh", "lakshadweep", "madhya-pradesh", "maharashtra", "manipur",
+    "meghalaya", "mizoram", "nagaland", "odisha", "puducherry", "punjab", "rajasthan",
+    "sikkim", "tamil-nadu", "telangana", "tripura", "uttar-pradesh", "uttarakhand",
+    "west-bengal",
+)
+TRANSACTION_TYPES = {   # type -> share of a state's transaction amount
+    "Merchant payments": 0.35,
+    "Peer-to-peer payments": 0.40,
+    "Recharge & bill payments": 0.15,
+    "Financial Services": 0.05,
+    "Others": 0.05,
+}
+FIRST_PERIOD, LAST_PERIOD = (2018, 1), (2024, 4)
+INSURANCE_START = (2020, 2)
+TOP_DISTRICTS = 10   # districts per state listed in the top_* tables
+
+
+def _periods(start=FIRST_PERIOD, end=LAST_PERIOD):
+    return pd.DataFrame([(y, q) for y in range(start[0], end[0] + 1) for q in range(1, 5)
+                         if start <= (y, q) <= end], columns=["Year", "Quarter"])
+
+
+def _cross(*frames):
+    out = frames[0]
+    for frame in frames[1:]:
+        out = out.merge(frame, how="cross")
+    return out
+
+
+def _districts(rng):
+    counts = rng.integers(2, 45, len(STATES))
+    return pd.DataFrame([(s, f"{s.replace('-', ' ')} district {i + 1}")
+                         for s, n in zip(STATES, counts) for i in range(n)],
+                        columns=["State", "District"])
+
+
+class _Generator:
+    def __init__(self, scale, seed):
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+        self.state_weight = dict(zip(STATES, self.rng.lognormal(0, 1.2, len(STATES))))
+
+    def _weights(self, keys, start=FIRST_PERIOD):
+        """Relative size of every key: state weight x growth since `start` x noise."""
+        t = (keys["Year"] - start[0]) * 4 + keys["Quarter"] - start[1]
+        return (keys["State"].map(self.state_weight).to_numpy() * 1.08 ** t.to_numpy()
+                * self.rng.lognormal(0, 0.3, len(keys)))
+
+    def _split(self, keys, totals):
+        """Repeat every key `scale` times and split its totals across the copies."""
+        rows = keys.loc[keys.index.repeat(self.scale)].reset_index(drop=True)
+        shares = self.rng.dirichlet(np.ones(self.scale), len(keys)).ravel()
+        for name, (values, integer) in totals.items():
+            split = np.repeat(values, self.scale) * shares
+            rows[name] = np.round(split).astype("int64") if integer else split
+        return rows
+
+    def transactions(self, keys, amount, ticket, start=FIRST_PERIOD):
+        weights = self._weights(keys, start)
+        amounts = amount * weights
+        counts = np.maximum(amounts / (ticket * self.rng.lognormal(0, 0.2, len(keys))), 1)
+        return self._split(keys, {"Transaction_Count": (counts, True), "Transaction_Amount": (amounts, False)})
+
+    def users(self, keys):
+        users = 2e6 * self._weights(keys)
+        opens = users * self.rng.uniform(0, 40, len(keys)) * (keys["Year"] >= 2019).to_numpy()
+        return self._split(keys, {"Registered_Users": (users, True), "App_Opens": (opens, True)})
+
+
+def tables(scale=1, seed=0):
+    """Generate the seven tables at `scale` in their compact schema: {table: DataFrame}."""
+    gen = _Generator(scale, seed)
+    states = pd.DataFrame({"State": STATES})
+    types = pd.DataFrame({"Transaction_Type": list(TRANSACTION_TYPES)})
+    districts = _districts(gen.rng)
+    periods, insured = _periods(), _periods(start=INSURANCE_START)
+
+    keys = _cross(states, periods, types)
+    type_share = keys["Transaction_Type"].map(TRANSACTION_TYPES).to_numpy()
+    frames = {
+        "aggregated_transaction": gen.transactions(keys, 2e10 * type_share, 1500),
+        "aggregated_user": gen.users(_cross(states, periods)),
+        "aggregated_insurance": gen.transactions(_cross(states, insured).assign(Transaction_Type="Insurance"),
+                                                 5e7, 2000, start=INSURANCE_START),
+        "map_transaction": gen.transactions(_cross(districts, periods), 8e8, 1500),
+        "map_insurance": gen.transactions(_cross(districts, insured), 2e6, 2000, start=INSURANCE_START),
+    }
+    for table, source in (("top_transaction_dist", "map_transaction"), ("top_insurance_dist", "map_insurance")):
+        df = frames[source]
+        totals = df.groupby(["State", "Year", "Quarter", "District"], as_index=False)["Transaction_Amount"].sum()
+        top = totals.sort_values("Transaction_Amount", ascending=False).groupby(["State", "Year", "Quarter"]).head(TOP_DISTRICTS)
+        frames[table] = df.merge(top[["State", "Year", "Quarter", "District"]])
+    return {table: schema.enforce(table, frames[table]) for table in TABLES}
+
+
+def write_database(frames, engine, chunksize=50000, if_exists="replace"):
+    """Replace (or append to) the tables in a database, e.g. a SQLite stand-in, with `frames`."""
+    for table, df in frames.items():
+        # Plain strings rather than categoricals, as a database returns them.
+        df = df.astype({c: "object" for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+        df.to_sql(table, engine, if_exists=if_exists, index=False, chunksize=chunksize)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("db", "snapshot"):
+        sys.exit("usage: python synthetic.py [db|snapshot] <scale> <database-url | snapshot-dir>")
+    target, scale, destination = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    frames = tables(scale)
+    if target == "db":
+        from db import make_engine
+        write_database(frames, make_engine(destination))
+    else:
+        snapshot.write(frames.items(), destination)
+    print(f"Wrote {sum(len(df) for df in frames.values()):,} rows at {scale}x to {destination}")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import data  # noqa: E402
+import synthetic  # noqa: E402
+
+# The stand-in database starts with every quarter before LANDED; tests load
+# LANDED (the next quarter) to simulate new data arriving.
+LANDED = (2021, 1)
+
+
+@pytest.fixture(scope="session")
+def frames():
+    return synthetic.tables(1)
+
+
+@pytest.fixture
+def stand_in(tmp_path, monkeypatch, frames):
+    """A SQLite stand-in database wired into the data layer, with empty caches."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'phonepe.db'}")
+    synthetic.write_database({t: df[df["Year"] < LANDED[0]] for t, df in frames.items()}, engine)
+    monkeypatch.setattr(data, "engine", engine)
+    monkeypatch.setattr(config, "SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    monkeypatch.setattr(config, "SNAPSHOT_MAX_AGE", 0)
+    monkeypatch.setattr(config, "QUERY_MODE", "sql")
+    monkeypatch.setattr(config, "ROLLUPS", "build")
+    data.clear_caches()
+    yield engine
+    data.clear_caches()
+
+
+@pytest.fixture
+def land(stand_in, frames):
+    """Append one (Year, Quarter) partition of the synthetic data to every table."""
+    def land(partition=LANDED):
+        year, quarter = partition
+        synthetic.write_database({t: df[(df["Year"] == year) & (df["Quarter"] == quarter)]
+                                  for t, df in frames.items()}, stand_in, if_exists="append")
+    return land
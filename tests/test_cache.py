@@ -0,0 +1,159 @@
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import cache as cache_module
+from cache import TTLCache, size_of
+
+VALUE = b"x" * 1000
+SIZE = size_of(VALUE)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.monotonic for the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=60)
+    cache.put("k", VALUE)
+    clock[0] += 60
+    assert cache.get("k") == VALUE
+
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert "k" not in cache
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = TTLCache(max_bytes=3 * SIZE)
+    for key in "abc":
+        cache.put(key, VALUE)
+    cache.get("a")   # now "b" is the least recently used
+    cache.put("d", VALUE)
+
+    assert [key in cache for key in "abcd"] == [True, False, True, True]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap_is_kept():
+    cache = TTLCache(max_bytes=3 * SIZE)
+    for i in range(10):
+        cache.put(i, VALUE)
+        assert cache.stats()["bytes"] <= 3 * SIZE
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 7
+
+
+def test_value_larger_than_cap_is_returned_but_not_stored():
+    cache = TTLCache(max_bytes=SIZE)
+    cache.put("small", VALUE)
+    big = VALUE * 2
+
+    assert cache.put("big", big) is big
+    assert cache.get_or_load("big", lambda: big) is big
+    assert "big" not in cache
+    assert cache.get("small") == VALUE   # nothing was evicted to make room
+    assert cache.stats()["evictions"] == 0
+
+
+def test_replacing_a_key_does_not_count_it_twice():
+    cache = TTLCache()
+    cache.put("k", VALUE)
+    cache.put("k", VALUE)
+    assert cache.stats()["bytes"] == SIZE
+    assert len(cache) == 1
+
+
+def test_frames_are_sized_by_their_memory():
+    df = pd.DataFrame({"State": ["goa", "kerala"] * 500, "Value": range(1000)})
+    assert size_of(df) == df.memory_usage(deep=True).sum()
+
+
+def test_hit_and_miss_counters():
+    cache = TTLCache()
+    assert cache.get_or_load("k", lambda: VALUE) == VALUE
+    cache.get("k")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert (stats["entries"], stats["bytes"]) == (1, SIZE)
+
+
+def _load_in_background(cache, key, value):
+    """Start `get_or_load(key)` on a thread whose loader blocks until released."""
+    started, release, out = threading.Event(), threading.Event(), {}
+
+    def loader():
+        started.set()
+        release.wait(5)
+        return value
+
+    thread = threading.Thread(target=lambda: out.setdefault("value", cache.get_or_load(key, loader)))
+    thread.start()
+    started.wait(5)
+
+    def finish():
+        release.set()
+        thread.join()
+        return out["value"]
+    return finish
+
+
+def test_concurrent_misses_load_once():
+    cache, calls = TTLCache(), []
+    finish = _load_in_background(cache, "k", "v")
+    waiter = threading.Thread(target=lambda: calls.append(cache.get_or_load("k", lambda: "again")))
+    waiter.start()
+
+    assert finish() == "v"
+    waiter.join()
+    assert calls == ["v"]
+    assert cache.get("k") == "v"
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate("k"),
+    lambda cache: cache.invalidate_where(lambda key: key == "k"),
+    lambda cache: cache.clear(),
+])
+def test_load_overtaken_by_invalidation_is_not_stored(invalidate):
+    cache = TTLCache()
+    finish = _load_in_background(cache, "k", "stale")
+    invalidate(cache)
+
+    assert finish() == "stale"
+    assert "k" not in cache
+    assert cache.get_or_load("k", lambda: "fresh") == "fresh"
+
+
+def test_put_during_load_wins():
+    cache = TTLCache()
+    finish = _load_in_background(cache, "k", "stale")
+    cache.put("k", "merged")
+
+    assert finish() == "stale"
+    assert cache.get("k") == "merged"
+
+
+@pytest.mark.parametrize("change", [
+    lambda cache: cache.put("other", "x"),
+    lambda cache: cache.invalidate("other"),
+    lambda cache: cache.invalidate_where(lambda key: key == "other"),
+])
+def test_changes_to_other_keys_keep_load(change):
+    cache = TTLCache()
+    finish = _load_in_background(cache, "k", "v")
+    change(cache)
+
+    assert finish() == "v"
+    assert cache.get("k") == "v"
@@ -0,0 +1,48 @@
+import threading
+import tracemalloc
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def traced():
+    if tracemalloc.is_tracing():
+        yield
+        return
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def test_stage_records_its_own_peak(traced):
+    with metrics.request(question="alone") as record:
+        with metrics.stage("pandas"):
+            block = bytearray(4 << 20)
+        del block
+    assert record["peak_bytes"] >= 4 << 20
+
+
+def test_overlapping_stages_record_no_peak(traced):
+    inside, release = threading.Event(), threading.Event()
+    records = {}
+
+    def other():
+        with metrics.request(question="other") as records["other"]:
+            with metrics.stage("read_sql"):
+                inside.set()
+                release.wait(5)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    inside.wait(5)
+    with metrics.request(question="overlapping") as record:
+        with metrics.stage("pandas"):
+            block = bytearray(4 << 20)
+        del block
+    release.set()
+    thread.join()
+
+    assert "peak_bytes" not in record
+    assert "peak_bytes" not in records["other"]
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+import rollups
+import schema
+from queries import aggregate, run_batch, run_query
+from questions import QUESTIONS
+
+AGGS = list(dict.fromkeys(q.query for q in QUESTIONS.values()))
+
+
+def _comparable(agg, df):
+    """Plain object/int64/float64 columns; projections (no sort order) sorted by every column."""
+    df = df.astype({c: "object" for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])})
+    df = df.astype({c: "int64" for c in df.columns if df[c].dtype.kind in "iu"})
+    if not agg.sort_order:
+        df = df.sort_values(list(df.columns), ignore_index=True)
+    return df
+
+
+@pytest.fixture(scope="module")
+def tables(frames):
+    return {t: schema.derive(t, schema.enforce(t, df[df["Year"] < 2021])) for t, df in frames.items()}
+
+
+@pytest.fixture
+def pushed_down(stand_in):
+    return {agg: run_query(agg, stand_in) for agg in AGGS}
+
+
+def test_batch_matches_single_queries(stand_in, pushed_down):
+    for agg, df in zip(AGGS, run_batch(AGGS, stand_in)):
+        pd.testing.assert_frame_equal(df, pushed_down[agg], obj=f"{agg.table} {agg.columns}")
+
+
+@pytest.mark.parametrize("agg", AGGS, ids=lambda agg: f"{agg.table}-{'-'.join(agg.columns)}")
+def test_every_path_gives_the_same_result(stand_in, tables, pushed_down, agg):
+    expected = _comparable(agg, pushed_down[agg])
+    pd.testing.assert_frame_equal(_comparable(agg, aggregate(agg, tables[agg.table])), expected,
+                                  check_exact=False, rtol=1e-9)
+    rollup = rollups.covering(agg)
+    if rollup is not None:
+        # Built in memory (pandas mode, snapshot) or pushed down (sql mode).
+        built = [aggregate(rollup.aggregation, tables[agg.table]), run_query(rollup.aggregation, stand_in)]
+        for df in built:
+            answered = rollups.answer(agg, df)
+            pd.testing.assert_frame_equal(_comparable(agg, answered), expected, check_exact=False, rtol=1e-9)
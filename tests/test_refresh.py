@@ -0,0 +1,142 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import config
+import data
+import ingest
+import snapshot
+from conftest import LANDED
+from questions import QUESTIONS, SCENARIOS
+
+
+def _fresh(question_id):
+    """The question's result computed from scratch, bypassing every cache."""
+    return data.compute(QUESTIONS[question_id].query)
+
+
+@pytest.mark.parametrize("mode", ["sql", "pandas"])
+def test_refresh_merges_new_quarter(stand_in, land, monkeypatch, mode):
+    monkeypatch.setattr(config, "QUERY_MODE", mode)
+    before = data.load_question("s4q2")
+    assert LANDED[0] not in set(before["Year"])
+
+    land()
+    changed = data.refresh()
+
+    assert changed["aggregated_transaction"] == [LANDED]
+    after = data.load_question("s4q2")
+    assert LANDED[0] in set(after["Year"])
+    assert after.equals(_fresh("s4q2"))
+
+
+def test_refresh_is_a_noop_without_new_data(stand_in):
+    data.load_question("s2q4")
+    assert data.refresh() == {}
+    assert data.refresh(full=True) == {}
+
+
+@pytest.mark.parametrize("table, column, question", [
+    ("aggregated_user", "App_Opens", "s2q4"),
+    ("aggregated_transaction", "Transaction_Count", "s4q2"),
+])
+def test_full_refresh_detects_restated_measure(stand_in, table, column, question):
+    data.load_question(question)
+    # Tables only queried through push-down are fingerprinted by their first refresh.
+    assert data.refresh() == {}
+    with stand_in.begin() as conn:
+        conn.execute(text(f'UPDATE "{table}" SET "{column}" = "{column}" + 1 '
+                          'WHERE "Year" = 2019 AND "Quarter" = 2'))
+
+    # Below the high-water mark: only a full refresh looks at it.
+    assert data.refresh() == {}
+    assert data.refresh(full=True) == {table: [(2019, 2)]}
+    assert data.load_question(question).equals(_fresh(question))
+
+
+def test_pandas_mode_fingerprints_the_loaded_table(stand_in, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_MODE", "pandas")
+    data.load_question("s2q4")
+    with stand_in.begin() as conn:
+        conn.execute(text('UPDATE "aggregated_user" SET "App_Opens" = "App_Opens" + 1 '
+                          'WHERE "Year" = 2019 AND "Quarter" = 2'))
+
+    assert data.refresh(full=True) == {"aggregated_user": [(2019, 2)]}
+    assert data.load_question("s2q4").equals(_fresh("s2q4"))
+
+
+def test_cold_prefetch_is_one_statement(stand_in, land):
+    statements = []
+    event.listen(stand_in, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    data.prefetch(SCENARIOS[0].questions)
+    assert len(statements) == 1
+
+    # The tables' latest partitions rode along, so quarters landing later are new.
+    land()
+    tables = {q.query.table for q in SCENARIOS[0].questions}
+    assert data.refresh() == {table: [LANDED] for table in tables}
+
+
+def _evict_all():
+    """What TTL expiry or LRU eviction does to every cached frame."""
+    for cache in (data.table_cache, data.rollup_cache, data.result_cache, data.output_cache):
+        cache.clear()
+
+
+@pytest.fixture
+def unreachable(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'missing' / 'phonepe.db'}")
+
+
+def test_snapshot_table_keeps_refreshed_quarters_after_eviction(stand_in, land):
+    snapshot.export(stand_in)
+    assert LANDED[0] not in set(data.load_question("s4q2")["Year"])
+    land()
+    assert data.refresh()["aggregated_transaction"] == [LANDED]
+
+    _evict_all()
+    assert LANDED[0] in set(data.load_question("s4q2")["Year"])
+    assert data.refresh() == {}
+    assert data.load_question("s4q2").equals(_fresh("s4q2"))
+
+
+def test_evicted_snapshot_table_catches_up_when_database_returns(stand_in, land, monkeypatch, unreachable):
+    snapshot.export(stand_in)
+    data.load_question("s4q2")
+    land()
+    data.refresh()
+
+    _evict_all()
+    monkeypatch.setattr(data, "engine", unreachable)
+    assert LANDED[0] not in set(data.load_question("s4q2")["Year"])
+
+    monkeypatch.setattr(data, "engine", stand_in)
+    assert data.refresh()["aggregated_transaction"] == [LANDED]
+    assert LANDED[0] in set(data.load_question("s4q2")["Year"])
+
+
+def test_refresh_without_database_skips_tables(stand_in, monkeypatch, unreachable):
+    snapshot.export(stand_in)
+    monkeypatch.setattr(data, "engine", unreachable)
+    for question_id in QUESTIONS:
+        data.load_question(question_id)
+
+    assert data.refresh() == {}
+    assert set(data.refresh_failures) == {q.query.table for q in QUESTIONS.values()}
+
+
+def test_failed_fetch_is_retried_by_next_refresh(stand_in, land, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_MODE", "pandas")   # the table is cached, so rows are fetched
+    data.load_question("s4q2")
+    land()
+    fetch = ingest.fetch_partitions
+
+    def dropped(*args):
+        monkeypatch.setattr(ingest, "fetch_partitions", fetch)
+        raise OperationalError("SELECT", {}, Exception("connection dropped"))
+    monkeypatch.setattr(ingest, "fetch_partitions", dropped)
+
+    assert "aggregated_transaction" not in data.refresh()
+    assert "aggregated_transaction" in data.refresh_failures
+    assert data.refresh()["aggregated_transaction"] == [LANDED]
+    assert data.load_question("s4q2").equals(_fresh("s4q2"))